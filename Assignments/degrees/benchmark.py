@@ -0,0 +1,162 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+import degrees
+from util import SearchStats
+
+# Source and target pairs run against the small dataset
+SMALL_PAIRS = [
+    ("Kevin Bacon", "Tom Hanks"),
+    ("Tom Cruise", "Tom Hanks"),
+    ("Emma Watson", "Kevin Bacon"),
+    ("Dustin Hoffman", "Sally Field"),
+    ("Gerald R. Molen", "Cary Elwes"),
+    ("Bill Paxton", "Valeria Golino"),
+]
+
+# Searches to time, by name
+ENGINES = {
+    "bfs": degrees.shortest_path,
+    "bidirectional": degrees.bidirectional_shortest_path,
+}
+
+# Ways of loading a dataset, by name
+LOADERS = {
+    "dicts": degrees.load_data,
+    "compact": degrees.load_graph,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark degrees searches.")
+    parser.add_argument("--people", type=int, default=20000,
+                        help="number of people in the synthetic dataset")
+    parser.add_argument("--movies", type=int, default=5000,
+                        help="number of movies in the synthetic dataset")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="number of random pairs to run against the synthetic dataset")
+    parser.add_argument("--seed", type=int, default=50)
+    args = parser.parse_args()
+
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+    benchmark("small", directory, lambda: resolve_pairs(SMALL_PAIRS))
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate_dataset(directory, args.people, args.movies, args.seed)
+        benchmark("synthetic", directory, lambda: random_pairs(args.queries, args.seed))
+
+
+def benchmark(label, directory, pairs):
+    """
+    Loads `directory` with each loader and times every engine over the
+    (source, target) ids returned by pairs().
+    """
+    for loader_name, loader in LOADERS.items():
+        reset()
+        start = time.perf_counter()
+        loader(directory)
+        load_time = time.perf_counter() - start
+        print(f"{label} / {loader_name}: loaded in {load_time * 1000:.1f} ms")
+
+        queries = pairs()
+        for engine_name, engine in ENGINES.items():
+            degrees.stats = SearchStats()
+            times = []
+            for source, target in queries:
+                start = time.perf_counter()
+                engine(source, target)
+                times.append(time.perf_counter() - start)
+            degrees.stats, stats = None, degrees.stats
+
+            times.sort()
+            print(f"  {engine_name:>14}: "
+                  f"p50 {percentile(times, 50) * 1000:8.3f} ms  "
+                  f"p90 {percentile(times, 90) * 1000:8.3f} ms  "
+                  f"p99 {percentile(times, 99) * 1000:8.3f} ms  "
+                  f"max {times[-1] * 1000:8.3f} ms  "
+                  f"expanded/query {stats.nodes_expanded / len(queries):10.1f}  "
+                  f"frontier peak {stats.frontier_peak}")
+
+
+def generate_dataset(directory, people, movies, seed):
+    """
+    Writes people, movies and stars CSV files for a synthetic dataset in which
+    a few prolific people star in many movies and most appear in only a few.
+    """
+    rng = random.Random(seed)
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(people):
+            writer.writerow([i, f"Person {i}", rng.randint(1920, 2005)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(movies):
+            writer.writerow([i, f"Movie {i}", rng.randint(1930, 2023)])
+
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(movies):
+            for _ in range(rng.randint(2, 8)):
+                # Cast a Pareto-distributed star a third of the time, so
+                # low ids become prolific hubs, and anyone otherwise
+                if rng.random() < 0.3:
+                    person = min(int(rng.paretovariate(1.2)) - 1, people - 1)
+                else:
+                    person = rng.randrange(people)
+                writer.writerow([person, movie])
+
+
+def resolve_pairs(pairs):
+    return [
+        (degrees.resolve_name(source), degrees.resolve_name(target))
+        for source, target in pairs
+    ]
+
+
+def random_pairs(count, seed):
+    """
+    Returns `count` reproducible random pairs of people who have starred in something.
+    """
+    rng = random.Random(seed)
+    if degrees.graph is not None:
+        people = [
+            degrees.graph.person_ids[person]
+            for person in range(len(degrees.graph.person_ids))
+            if degrees.graph.person_offsets[person] != degrees.graph.person_offsets[person + 1]
+        ]
+    else:
+        people = [person_id for person_id in degrees.people if degrees.people[person_id]["movies"]]
+    people.sort(key=int)
+    return [(rng.choice(people), rng.choice(people)) for _ in range(count)]
+
+
+def reset():
+    """
+    Forgets any dataset previously loaded into the degrees module.
+    """
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+    degrees.trees = None
+    degrees.name_index = None
+
+
+def percentile(values, p):
+    """
+    Returns the pth percentile of sorted `values` by nearest rank.
+    """
+    rank = max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))
+    return values[rank]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
+import argparse
 import csv
+import json
+import multiprocessing
+import os
 import sys
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-from util import Node, Queue
+from graph import Graph, in_years, parse_year
+from nameindex import NameIndex
+from trees import SourceTree, TreeCache
+from util import Node, QueueFrontier, SearchStats
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +22,37 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed graph, used in place of the dicts above when loaded
+graph = None
+
+# The (loader, directory) the current dataset came from, so worker
+# processes that cannot fork can load it again
+dataset = None
+
+# File the compact graph is cached in, inside the dataset directory
+SNAPSHOT = "degrees.snapshot"
+
+# Index of normalized names, built the first time it is needed
+name_index = None
+
+# Work counters for the current run, when profiling
+stats = None
+
+# Cache of single-source search trees, when enabled
+trees = None
+
+# Directory source trees are persisted in, inside the dataset directory
+TREES = "trees"
+
 
 def load_data(directory):
     """
     Load data from CSV files into memory.
     """
+    global dataset, name_index
+    dataset = (load_data, directory)
+    name_index = None
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -52,25 +88,176 @@ def load_data(directory):
                 pass
 
 
-def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+def load_graph(directory):
+    """
+    Load data from CSV files into a compact integer-indexed graph
+    instead of the names, people and movies dicts.
+    """
+    global graph, dataset, name_index
+    graph = Graph.from_csv(directory)
+    dataset = (load_graph, directory)
+    name_index = None
+
+
+def load_snapshot(directory):
+    """
+    Memory-map the compact graph from a binary snapshot in `directory`,
+    rebuilding the snapshot from the CSV files first if it is missing
+    or any of them have changed since it was written.
+    """
+    global graph, dataset, name_index
+    dataset = (load_snapshot, directory)
+    name_index = None
+    path = os.path.join(directory, SNAPSHOT)
+    source = csv_signature(directory)
+    try:
+        graph = Graph.load(path)
+        if graph.source == source:
+            return
+    except (OSError, ValueError, TypeError, KeyError):
+        # Missing, truncated or hand-edited snapshots are rebuilt
+        pass
+
+    graph = Graph.from_csv(directory)
+    try:
+        graph.save(path, source)
+    except OSError as e:
+        # The graph is still usable, it just has to be rebuilt next run
+        print(f"Could not save snapshot: {e}", file=sys.stderr)
+
+
+def csv_signature(directory):
+    """
+    Returns the modification time and size of each CSV file in the dataset.
+    """
+    signature = {}
+    for filename in ("people.csv", "movies.csv", "stars.csv"):
+        stat = os.stat(os.path.join(directory, filename))
+        signature[filename] = [stat.st_mtime_ns, stat.st_size]
+    return signature
+
 
+def enable_tree_cache(budget, persist=True):
+    """
+    Cache single-source search trees for the loaded dataset, holding at
+    most `budget` bytes of them in memory. With `persist`, trees are also
+    saved in the dataset directory and reused by later runs.
+    """
+    global trees
+    loader, directory = dataset
+    signature = ["compact" if graph is not None else "dicts", csv_signature(directory)]
+    path = os.path.join(directory, TREES) if persist else None
+    trees = TreeCache(budget, path, signature)
+
+
+def main():
+    parser = argparse.ArgumentParser(usage="python degrees.py [directory]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="load the dataset as a compact integer-indexed graph")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="like --compact, but cache the graph in a binary snapshot")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer tab-separated name pairs from FILE ('-' for stdin)")
+    parser.add_argument("--serve", metavar="PORT", type=int,
+                        help="answer HTTP queries on localhost:PORT until interrupted")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to answer batch queries with")
+    parser.add_argument("--tree-cache", metavar="MB", type=float,
+                        help="cache up to MB megabytes of single-source search trees")
+    parser.add_argument("--distances", metavar="NAME",
+                        help="print how many people are at each degree from NAME")
+    parser.add_argument("--search", metavar="TEXT",
+                        help="list people whose names start with or closely match TEXT")
+    parser.add_argument("-k", type=int, default=1,
+                        help="number of paths through different people to list")
+    parser.add_argument("--slack", type=int, default=0,
+                        help="allow paths up to SLACK degrees longer than the shortest")
+    parser.add_argument("--min-year", type=int, help="only use movies released from this year")
+    parser.add_argument("--max-year", type=int, help="only use movies released up to this year")
+    parser.add_argument("--exclude", metavar="NAME", action="append", default=[],
+                        help="never connect through this person (may be repeated)")
+    parser.add_argument("--profile", action="store_true",
+                        help="report search work and time per phase on stderr")
+    args = parser.parse_args()
+
+    global stats
+    if args.profile:
+        stats = SearchStats()
+    try:
+        run(parser, args)
+    finally:
+        if stats is not None:
+            print(stats.report(), file=sys.stderr)
+
+
+def run(parser, args):
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=sys.stderr if args.batch else sys.stdout)
+    with phase("load"):
+        if args.snapshot:
+            load_snapshot(args.directory)
+        elif args.compact:
+            load_graph(args.directory)
+        else:
+            load_data(args.directory)
+    print("Data loaded.", file=sys.stderr if args.batch else sys.stdout)
+
+    if args.tree_cache is not None:
+        enable_tree_cache(int(args.tree_cache * 1024 * 1024))
+    if args.search:
+        candidates = get_name_index().prefix(args.search) or get_name_index().fuzzy(args.search)
+        for candidate in candidates:
+            print(f"ID: {candidate.person_id}, Name: {candidate.name}, Birth: {candidate.birth}")
+        return
+    if args.distances:
+        try:
+            counts = source_tree(resolve_name(args.distances)).histogram()
+        except LookupError as e:
+            parser.exit(1, f"{e}\n")
+        for distance, count in enumerate(counts):
+            print(f"{distance}: {count}")
+        return
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, args.workers)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, args.workers)
+        return
+    if args.serve is not None:
+        serve(args.serve)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
-        sys.exit("Person not found.")
+        parser.exit(1, "Person not found.\n")
     target = person_id_for_name(input("Name: "))
     if target is None:
-        sys.exit("Person not found.")
+        parser.exit(1, "Person not found.\n")
+
+    constrained = args.min_year is not None or args.max_year is not None or args.exclude
+    if args.k == 1 and args.slack == 0 and not constrained:
+        with phase("search"):
+            path = bidirectional_shortest_path(source, target)
+        print_path(source, path)
+        return
+
+    try:
+        exclude = {resolve_name(name) for name in args.exclude}
+    except LookupError as e:
+        parser.exit(1, f"{e}\n")
+    with phase("search"):
+        paths = k_shortest_paths(source, target, args.k, args.slack,
+                                 args.min_year, args.max_year, exclude)
+    if not paths:
+        print("Not connected.")
+    for path in paths:
+        print_path(source, path)
 
-    path = shortest_path(source, target)
 
+def print_path(source, path):
     if path is None:
         print("Not connected.")
     else:
@@ -78,9 +265,9 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_name(path[i][1])
+            person2 = person_name(path[i + 1][1])
+            movie = movie_title(path[i + 1][0])
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -91,35 +278,55 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
+    tree = cached_tree(source, target)
+    if tree is not None:
+        return tree_path(tree, source, target)
+    if graph is not None:
+        return graph_path(breadth_first_search, source, target)
+    return breadth_first_search(source, target, counted(neighbors_for_person))
+
+
+def breadth_first_search(source, target, neighbors, frontier=None):
+    """
+    Searches outwards from source using `neighbors` to list the
+    (movie, person) pairs connected to a person.
+
+    Explores breadth first by default; pass another frontier, such as a
+    StackFrontier or PriorityFrontier, to change the order people are
+    expanded in.
+    """
+    if source == target:
+        return []
 
-    explored = []
-    frontier = Queue()
+    explored = set()
+    if frontier is None:
+        frontier = QueueFrontier()
     frontier.add(Node(source, None, None))
     found = False
 
     while not found:
-         # No path can be found
+        # No path can be found
         if frontier.empty(): return None
 
         node: Node = frontier.remove()
+        explored.add(node.state) # Add id to explored set
+        if stats is not None:
+            stats.nodes_expanded += 1
 
-        if node.state in explored: # Remove duplicate paths to same node
-            while node.state in explored:
-                node: Node = frontier.remove()
-        
-        current = node
-
-        explored.append(node.state) # Add id to explored list
-        neighbors = neighbors_for_person(node.state)
-        
-        for neighbor in neighbors: 
+        for neighbor in neighbors(node.state):
             if neighbor[1] == target: # If target is found
                 current = Node(neighbor[1], node, neighbor[0])
                 found = True
                 break
 
+            # Skip people already explored or waiting to be
+            if neighbor[1] in explored or frontier.contains_state(neighbor[1]):
+                continue
             frontier.add(Node(neighbor[1], node, neighbor[0]))
 
+        if stats is not None:
+            stats.frontier(len(frontier))
+
     # Construct shortest path by traversing parent attributes
     path = []
     path.append((current.action, current.state))
@@ -133,20 +340,482 @@ def shortest_path(source, target):
     return path
 
 
+def run_batch(lines, out, workers=1):
+    """
+    Answers one query per line of `lines`, each a source and target name
+    separated by a tab, writing a JSON result per line to `out` in input
+    order as soon as it is known. Queries are spread over `workers`
+    processes when more than one is given.
+    """
+    rows = (row for row in csv.reader(lines, delimiter="\t") if row)
+    if workers == 1:
+        results = map(separation_row, rows)
+    else:
+        pool = worker_pool(workers)
+        results = pool.imap(separation_row, rows, chunksize=16)
+
+    try:
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if workers != 1:
+            pool.terminate()
+
+
+def separation_row(row):
+    if len(row) != 2:
+        return {"error": f"expected 2 tab-separated names, got {len(row)}"}
+    return separation(row[0], row[1])
+
+
+def shortest_paths(pairs, workers=None):
+    """
+    Returns the shortest path between each (source, target) pair of
+    IMDB ids, in input order, searching with `workers` processes
+    (one per CPU by default).
+    """
+    pairs = list(pairs)
+    if workers == 1 or len(pairs) < 2:
+        return [bidirectional_shortest_path(source, target) for source, target in pairs]
+
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(pairs) // (4 * workers))
+    with worker_pool(workers) as pool:
+        return pool.starmap(bidirectional_shortest_path, pairs, chunksize)
+
+
+def worker_pool(workers):
+    """
+    Returns a process pool sharing the loaded dataset. Forked workers
+    inherit it copy-on-write instead of having it pickled per task;
+    elsewhere each worker loads the dataset once when it starts.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork").Pool(workers)
+    loader, directory = dataset
+    return multiprocessing.Pool(workers, loader, (directory,))
+
+
+def serve(port):
+    """
+    Answers GET /?source=NAME&target=NAME requests on localhost with
+    JSON results, keeping the loaded dataset in memory between requests.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), SeparationHandler)
+    print(f"Serving on http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class SeparationHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        if len(query.get("source", [])) != 1 or len(query.get("target", [])) != 1:
+            status = 400
+            result = {"error": "expected exactly one source and one target"}
+        else:
+            status = 200
+            result = separation(query["source"][0], query["target"][0])
+
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def separation(source_name, target_name):
+    """
+    Returns a JSON-friendly dict describing the shortest connection
+    between two people given by name, with an "error" key instead
+    if either name does not identify exactly one person.
+    """
+    result = {"source": source_name, "target": target_name}
+    try:
+        with phase("names"):
+            source = resolve_name(source_name)
+            target = resolve_name(target_name)
+    except LookupError as e:
+        result["error"] = str(e)
+        result["candidates"] = [
+            candidate._asdict()
+            for name in (source_name, target_name)
+            for candidate in candidates_for_name(name)
+        ]
+        return result
+
+    # Searching everything reachable from the source pays off when the
+    # tree is cached and reused by later queries from the same person
+    with phase("search"):
+        if trees is not None:
+            source_tree(source)
+        path = bidirectional_shortest_path(source, target)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = []
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {"movie": movie_title(movie_id), "person": person_name(person_id)}
+            for movie_id, person_id in path
+        ]
+    return result
+
+
+def resolve_name(name):
+    """
+    Returns the IMDB id for a person's name without prompting,
+    raising LookupError if the name is unknown or ambiguous.
+
+    Names that are not found as typed are looked up again ignoring
+    accents, case and extra whitespace, as the name index does.
+    """
+    person_ids = person_ids_for_name(name)
+    if len(person_ids) == 0:
+        person_ids = [candidate.person_id for candidate in get_name_index().exact(name)]
+    if len(person_ids) == 0:
+        raise LookupError(f"person not found: {name}")
+    elif len(person_ids) > 1:
+        raise LookupError(f"ambiguous name: {name} (ids {', '.join(sorted(person_ids))})")
+    return person_ids[0]
+
+
+def get_name_index():
+    """
+    Returns the name index for the loaded dataset, building it on first use.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            name_index = NameIndex(graph.person_ids, graph.names, graph.births)
+        else:
+            person_ids = list(people)
+            name_index = NameIndex(
+                person_ids,
+                [people[person_id]["name"] for person_id in person_ids],
+                [people[person_id]["birth"] for person_id in person_ids]
+            )
+    return name_index
+
+
+def candidates_for_name(name, max_distance=2):
+    """
+    Returns the people a name could refer to, ranked best first: everyone
+    sharing an ambiguous name, or close spellings of an unknown one.
+    Returns an empty list if resolve_name accepts the name.
+    """
+    try:
+        resolve_name(name)
+        return []
+    except LookupError:
+        pass
+    matches = get_name_index().exact(name)
+    if matches:
+        return matches
+    return get_name_index().fuzzy(name, max_distance)
+
+
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards
+    from both people at once until the two searches meet.
+
+    If no possible path, returns None.
+    """
+    tree = cached_tree(source, target)
+    if tree is not None:
+        return tree_path(tree, source, target)
+    if graph is not None:
+        return graph_path(bidirectional_search, source, target)
+    return bidirectional_search(source, target, counted(neighbors_for_person))
+
+
+def bidirectional_search(source, target, neighbors):
+    """
+    Meets in the middle between source and target using `neighbors`
+    to list the (movie, person) pairs connected to a person.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie_id, person_id) step that
+    # leads back towards the side it was reached from
+    forward = {source: None}
+    backward = {target: None}
+    forwardFrontier = [source]
+    backwardFrontier = [target]
+
+    while forwardFrontier and backwardFrontier:
+        # Always grow the smaller side so the two searches stay balanced
+        if len(forwardFrontier) <= len(backwardFrontier):
+            forwardFrontier, meeting = expand_level(forwardFrontier, forward, backward, neighbors)
+        else:
+            backwardFrontier, meeting = expand_level(backwardFrontier, backward, forward, neighbors)
+
+        if stats is not None:
+            stats.frontier(len(forwardFrontier) + len(backwardFrontier))
+
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    # One side ran out of people without reaching the other
+    return None
+
+
+def expand_level(frontier, visited, other, neighbors):
+    """
+    Expands every person in `frontier` by one degree, recording newly
+    reached people in `visited`.
+
+    Returns the next frontier and a person reached by both searches,
+    or None if the searches have not met yet.
+    """
+    nextFrontier = []
+    for person_id in frontier:
+        if stats is not None:
+            stats.nodes_expanded += 1
+        for movie_id, neighbor in neighbors(person_id):
+            if neighbor in visited:
+                continue
+            visited[neighbor] = (movie_id, person_id)
+            if neighbor in other:
+                return nextFrontier, neighbor
+            nextFrontier.append(neighbor)
+    return nextFrontier, None
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Stitches the forward and backward search trees together at `meeting`
+    into a list of (movie_id, person_id) pairs from source to target.
+    """
+    path = []
+    current = meeting
+    while forward[current] is not None:
+        movie_id, parent = forward[current]
+        path.append((movie_id, current))
+        current = parent
+    path.reverse()
+
+    current = meeting
+    while backward[current] is not None:
+        movie_id, child = backward[current]
+        path.append((movie_id, child))
+        current = child
+
+    return path
+
+
+def graph_path(search, source, target):
+    """
+    Runs `search` over the compact graph, translating IMDB ids
+    to graph indices and back.
+    """
+    path = search(graph.person_index(source), graph.person_index(target), counted(graph.neighbors))
+    return decode_path(path)
+
+
+def decode_path(path):
+    """
+    Translates a path of compact graph indices back to IMDB ids.
+    """
+    if path is None:
+        return None
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def k_shortest_paths(source, target, k, slack=0, min_year=None, max_year=None, exclude=None):
+    """
+    Returns up to k lists of (movie_id, person_id) pairs connecting
+    source to target through different people, shortest first.
+
+    Paths may be up to `slack` degrees longer than the shortest one.
+    Only movies released within min_year..max_year and people not in
+    `exclude` are used; both are pruned while expanding people rather
+    than by filtering finished paths.
+    """
+    if exclude and (source in exclude or target in exclude):
+        return []
+    if graph is None:
+        def neighbors(person):
+            return neighbors_for_person(person, min_year, max_year, exclude)
+        return k_shortest_search(source, target, k, slack, counted(neighbors))
+
+    if exclude:
+        exclude = {graph.person_index(excluded) for excluded in exclude}
+
+    def neighbors(person):
+        return graph.neighbors(person, min_year, max_year, exclude)
+    paths = k_shortest_search(graph.person_index(source), graph.person_index(target),
+                              k, slack, counted(neighbors))
+    return [decode_path(path) for path in paths]
+
+
+def k_shortest_search(source, target, k, slack, neighbors):
+    """
+    Enumerates up to k simple paths from source to target with distinct
+    sequences of people, in order of length, using `neighbors` to list
+    the (movie, person) pairs connected to a person.
+
+    A breadth-first search from the target first records how far away
+    each nearby person is. A depth-first search from the source then only
+    steps to people from whom the target can still be reached within the
+    remaining length, so only paths that are actually returned are built.
+    """
+    # Distance to the target for everyone within the longest allowed length
+    distances = {target: 0}
+    frontier = [target]
+    limit = None
+    depth = 0
+    while frontier and (limit is None or depth < limit):
+        depth += 1
+        nextFrontier = []
+        for person in frontier:
+            if stats is not None:
+                stats.nodes_expanded += 1
+            for _, neighbor in neighbors(person):
+                if neighbor not in distances:
+                    distances[neighbor] = depth
+                    nextFrontier.append(neighbor)
+        frontier = nextFrontier
+        if stats is not None:
+            stats.frontier(len(frontier))
+        if limit is None and source in distances:
+            limit = distances[source] + slack
+
+    if source not in distances:
+        return []
+
+    paths = []
+    for length in range(distances[source], limit + 1):
+        for path in paths_of_length(source, target, length, distances, neighbors):
+            paths.append(path)
+            if len(paths) == k:
+                return paths
+    return paths
+
+
+def paths_of_length(source, target, length, distances, neighbors):
+    """
+    Yields every simple path of exactly `length` degrees from source to
+    target, taking one movie for each pair of consecutive people.
+    """
+    path = []
+    onPath = {source}
+
+    def extend(person):
+        if stats is not None:
+            stats.nodes_expanded += 1
+        remaining = length - len(path) - 1
+        seen = set()
+        for movie, neighbor in neighbors(person):
+            if neighbor in seen or neighbor in onPath:
+                continue
+            seen.add(neighbor)
+            if neighbor == target:
+                if remaining == 0:
+                    yield path + [(movie, neighbor)]
+                continue
+            if remaining == 0 or distances.get(neighbor, remaining + 1) > remaining:
+                continue
+            path.append((movie, neighbor))
+            onPath.add(neighbor)
+            yield from extend(neighbor)
+            onPath.remove(neighbor)
+            path.pop()
+
+    if source == target:
+        if length == 0:
+            yield []
+        return
+    yield from extend(source)
+
+
+def source_tree(source):
+    """
+    Returns the search tree of everyone reachable from `source`,
+    building it with one breadth-first search if it is not cached.
+    """
+    if trees is None:
+        return build_tree(source)
+    return trees.get(source, build_tree)
+
+
+def build_tree(source):
+    if graph is not None:
+        return SourceTree.build(graph.person_index(source), counted(graph.neighbors),
+                                len(graph.person_ids))
+    return SourceTree.build(source, counted(neighbors_for_person))
+
+
+def cached_tree(source, target):
+    """
+    Returns a cached search tree rooted at source or target, or None.
+    """
+    if trees is None:
+        return None
+    return trees.peek(source) or trees.peek(target)
+
+
+def tree_path(tree, source, target):
+    """
+    Reads the path between source and target out of `tree`, a search
+    tree rooted at either of them, in time proportional to its length.
+
+    The tree is passed in rather than looked up again, since another
+    thread may evict it from the cache in between.
+    """
+    if graph is None:
+        return tree.path_to(target) if tree.source == source else tree.path_from(source)
+    source, target = graph.person_index(source), graph.person_index(target)
+    path = tree.path_to(target) if tree.source == source else tree.path_from(source)
+    return decode_path(path)
+
+
+def counted(neighbors):
+    """
+    Wraps a neighbors function to count its calls when profiling.
+    """
+    if stats is None:
+        return neighbors
+
+    def wrapper(*args):
+        stats.neighbor_calls += 1
+        return neighbors(*args)
+    return wrapper
+
+
+def phase(name):
+    """
+    Returns a context manager timing a phase of work when profiling.
+    """
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
+            name = person_name(person_id)
+            birth = person_birth(person_id)
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
         try:
             person_id = input("Intended Person ID: ")
@@ -159,18 +828,63 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
-def neighbors_for_person(person_id):
+def neighbors_for_person(person_id, min_year=None, max_year=None, exclude=None):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
+
+    Optionally leaves out movies released outside min_year..max_year
+    and people whose ids are in `exclude`.
     """
+    if graph is not None:
+        if exclude:
+            exclude = {graph.person_index(excluded) for excluded in exclude}
+        return {
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in graph.neighbors(graph.person_index(person_id),
+                                                 min_year, max_year, exclude)
+        }
+
     movie_ids = people[person_id]["movies"]
+    constrained = min_year is not None or max_year is not None
     neighbors = set()
     for movie_id in movie_ids:
+        if constrained and not in_years(parse_year(movies[movie_id]["year"]), min_year, max_year):
+            continue
         for person_id in movies[movie_id]["stars"]:
+            if exclude and person_id in exclude:
+                continue
             neighbors.add((movie_id, person_id))
     return neighbors
 
 
+def person_ids_for_name(name):
+    """
+    Returns a list of the IMDB ids of every person with a given name.
+    """
+    if graph is not None:
+        return [graph.person_ids[person] for person in graph.people_named(name)]
+    return list(names.get(name.lower(), set()))
+
+
+def person_name(person_id):
+    if graph is not None:
+        return graph.names[graph.person_index(person_id)]
+    return people[person_id]["name"]
+
+
+def person_birth(person_id):
+    if graph is not None:
+        birth = graph.births[graph.person_index(person_id)]
+        return str(birth) if birth else ""
+    return people[person_id]["birth"]
+
+
+def movie_title(movie_id):
+    if graph is not None:
+        return graph.titles[graph.movie_index(movie_id)]
+    return movies[movie_id]["title"]
+
+
 if __name__ == "__main__":
     main()
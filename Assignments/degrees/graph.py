@@ -0,0 +1,299 @@
+import csv
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+
+# Identifies a binary snapshot written by Graph.save
+SNAPSHOT_MAGIC = b"DEGRSNAP"
+
+# Graph attributes written to snapshots, in constructor order
+FIELDS = (
+    "person_ids", "names", "births", "movie_ids", "titles", "years",
+    "person_offsets", "person_movies", "movie_offsets", "movie_stars",
+    "person_order", "movie_order", "name_order"
+)
+
+
+class StringTable():
+    """
+    Immutable sequence of strings packed into a single UTF-8 buffer,
+    where string i occupies bytes offsets[i] up to offsets[i + 1].
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        data = bytearray()
+        offsets = array("q", [0])
+        for string in strings:
+            data += string.encode("utf-8")
+            offsets.append(len(data))
+        return cls(bytes(data), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class Graph():
+    """
+    Bipartite person-movie graph with person and movie ids interned into
+    dense integers 0..n-1.
+
+    Starring relationships are stored twice as compressed sparse rows:
+    the movies of person p are person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and the stars of movie m are movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+    Unknown birth and release years are stored as 0.
+    """
+
+    def __init__(self, person_ids, names, births, movie_ids, titles, years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_order=None, movie_order=None, name_order=None):
+        self.person_ids = person_ids
+        self.names = names
+        self.births = births
+        self.movie_ids = movie_ids
+        self.titles = titles
+        self.years = years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # What the graph was built from, recorded by snapshots
+        self.source = None
+
+        # Permutations sorted by id and by lowercased name so lookups
+        # can binary search instead of keeping dicts of strings around
+        if person_order is None:
+            person_order = array("i", sorted(range(len(person_ids)), key=person_ids.__getitem__))
+        if movie_order is None:
+            movie_order = array("i", sorted(range(len(movie_ids)), key=movie_ids.__getitem__))
+        if name_order is None:
+            name_order = array("i", sorted(range(len(names)), key=self.name_key))
+        self.person_order = person_order
+        self.movie_order = movie_order
+        self.name_order = name_order
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Build a graph from the people, movies and stars CSV files in `directory`.
+        """
+        person_ids, names, births = [], [], array("h")
+        person_index = {}
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["id"] in person_index:
+                    continue
+                person_index[row["id"]] = len(person_ids)
+                person_ids.append(row["id"])
+                names.append(row["name"])
+                births.append(parse_year(row["birth"]))
+
+        movie_ids, titles, years = [], [], array("h")
+        movie_index = {}
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["id"] in movie_index:
+                    continue
+                movie_index[row["id"]] = len(movie_ids)
+                movie_ids.append(row["id"])
+                titles.append(row["title"])
+                years.append(parse_year(row["year"]))
+
+        stars = set()
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person = person_index.get(row["person_id"])
+                movie = movie_index.get(row["movie_id"])
+                if person is not None and movie is not None:
+                    stars.add((person, movie))
+        del person_index, movie_index
+
+        people = array("i", (person for person, _ in stars))
+        films = array("i", (movie for _, movie in stars))
+        del stars
+        person_offsets, person_movies = compress(people, films, len(person_ids))
+        movie_offsets, movie_stars = compress(films, people, len(movie_ids))
+
+        return cls(
+            StringTable.from_strings(person_ids), StringTable.from_strings(names), births,
+            StringTable.from_strings(movie_ids), StringTable.from_strings(titles), years,
+            person_offsets, person_movies, movie_offsets, movie_stars
+        )
+
+    def save(self, path, source=None):
+        """
+        Write the graph to a binary snapshot at `path` that Graph.load
+        can memory-map. `source` is stored alongside so callers can tell
+        whether the snapshot is still up to date.
+        """
+        sections = []
+        for field in FIELDS:
+            value = getattr(self, field)
+            if isinstance(value, StringTable):
+                sections.append((f"{field}.data", memoryview(value.data)))
+                sections.append((f"{field}.offsets", memoryview(value.offsets)))
+            else:
+                sections.append((field, memoryview(value)))
+
+        layout = []
+        offset = 0
+        for name, view in sections:
+            layout.append([name, view.format, offset, view.nbytes])
+            offset = align(offset + view.nbytes)
+        header = json.dumps({"source": source, "sections": layout}).encode("utf-8")
+
+        # Write to a temporary file first so readers never see half a snapshot
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            f.write(bytes(align(16 + len(header)) - 16 - len(header)))
+            for name, view in sections:
+                f.write(view)
+                f.write(bytes(align(view.nbytes) - view.nbytes))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map a snapshot written by Graph.save. Arrays are read
+        straight out of the page cache rather than parsed, so loading
+        takes time independent of the size of the dataset.
+        """
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buffer)
+        if view[:8] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a degrees snapshot")
+        header_length = int.from_bytes(view[8:16], "little")
+        header = json.loads(str(view[16:16 + header_length], "utf-8"))
+
+        start = align(16 + header_length)
+        sections = {
+            name: view[start + offset:start + offset + length].cast(format)
+            for name, format, offset, length in header["sections"]
+        }
+        fields = []
+        for field in FIELDS:
+            if f"{field}.data" in sections:
+                fields.append(StringTable(sections[f"{field}.data"], sections[f"{field}.offsets"]))
+            else:
+                fields.append(sections[field])
+
+        graph = cls(*fields)
+        graph.source = header["source"]
+        return graph
+
+    def name_key(self, person):
+        return self.names[person].lower()
+
+    def person_index(self, person_id):
+        """
+        Returns the integer index for an IMDB person id, or None if unknown.
+        """
+        return find(self.person_order, person_id, self.person_ids.__getitem__)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the integer index for an IMDB movie id, or None if unknown.
+        """
+        return find(self.movie_order, movie_id, self.movie_ids.__getitem__)
+
+    def people_named(self, name):
+        """
+        Returns the indices of every person whose name matches `name`,
+        ignoring case.
+        """
+        name = name.lower()
+        order = self.name_order
+        i = bisect_left(order, name, key=self.name_key)
+        matches = []
+        while i < len(order) and self.name_key(order[i]) == name:
+            matches.append(order[i])
+            i += 1
+        return matches
+
+    def neighbors(self, person, min_year=None, max_year=None, exclude=None):
+        """
+        Yields (movie, person) index pairs for people who starred with `person`.
+
+        Movies released outside min_year..max_year and people in the
+        `exclude` set are skipped as they are reached.
+        """
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        constrained = min_year is not None or max_year is not None
+        for i in range(self.person_offsets[person], self.person_offsets[person + 1]):
+            movie = person_movies[i]
+            if constrained and not in_years(self.years[movie], min_year, max_year):
+                continue
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                if exclude and movie_stars[j] in exclude:
+                    continue
+                yield movie, movie_stars[j]
+
+
+def find(order, key, key_of):
+    """
+    Binary searches `order`, a permutation sorted by `key_of`, for `key`.
+    """
+    i = bisect_left(order, key, key=key_of)
+    if i < len(order) and key_of(order[i]) == key:
+        return order[i]
+    return None
+
+
+def compress(rows, columns, count):
+    """
+    Groups `columns` by `rows` into compressed sparse row arrays,
+    returning (offsets, values) for `count` rows.
+    """
+    offsets = array("q", bytes(8 * (count + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+
+    values = array("i", bytes(4 * len(columns)))
+    cursor = array("q", offsets[:-1])
+    for row, column in zip(rows, columns):
+        values[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, values
+
+
+def align(offset):
+    """
+    Rounds `offset` up to the next multiple of 8 bytes.
+    """
+    return (offset + 7) & ~7
+
+
+def in_years(year, min_year, max_year):
+    """
+    Returns whether `year` lies within min_year..max_year, either of which
+    may be None. Unknown years (0) never satisfy a constraint.
+    """
+    if not year:
+        return min_year is None and max_year is None
+    return ((min_year is None or year >= min_year) and
+            (max_year is None or year <= max_year))
+
+
+def parse_year(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
@@ -0,0 +1,159 @@
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from graph import StringTable
+
+# A person matching a name lookup, `distance` edits away from the query
+Candidate = namedtuple("Candidate", ["person_id", "name", "birth", "distance"])
+
+# Sorts after every character that can appear in a name
+LAST_CHARACTER = "\U0010ffff"
+
+
+class NameIndex():
+    """
+    Sorted index over normalized names supporting exact, prefix and
+    bounded edit distance lookups without prompting.
+
+    `person_ids`, `names` and `births` are parallel sequences describing
+    every person, such as the columns of a compact Graph. Building the
+    index normalizes and sorts every name, which takes several seconds
+    for a million names; it is built once per process and is not stored
+    in graph snapshots.
+    """
+
+    def __init__(self, person_ids, names, births):
+        self.person_ids = person_ids
+        self.names = names
+        self.births = births
+
+        keys = [normalize(name) for name in names]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = StringTable.from_strings(keys[i] for i in order)
+        self.order = array("i", order)
+
+    def candidate(self, position, distance=0):
+        person = self.order[position]
+        birth = self.births[person]
+        return Candidate(self.person_ids[person], self.names[person],
+                         str(birth) if birth else "", distance)
+
+    def exact(self, text):
+        """
+        Returns every person whose normalized name equals that of `text`.
+        """
+        key = normalize(text)
+        i = bisect_left(self.keys, key)
+        matches = []
+        while i < len(self.keys) and self.keys[i] == key:
+            matches.append(self.candidate(i))
+            i += 1
+        return matches
+
+    def prefix(self, text, limit=10):
+        """
+        Returns up to `limit` people whose normalized name starts with
+        that of `text`, in alphabetical order.
+        """
+        key = normalize(text)
+        i = bisect_left(self.keys, key)
+        matches = []
+        while i < len(self.keys) and len(matches) < limit and self.keys[i].startswith(key):
+            matches.append(self.candidate(i))
+            i += 1
+        return matches
+
+    def fuzzy(self, text, max_distance=2, limit=10):
+        """
+        Returns up to `limit` people whose normalized name is within
+        `max_distance` edits of that of `text`, closest first.
+
+        The sorted keys are walked as an implicit trie: edit distance rows
+        are shared between keys with a common prefix, and every key under
+        a prefix that is already too far away is skipped by binary search.
+
+        This does not meet the sub-millisecond target exact and prefix
+        lookups do. Every key within `max_distance` edits of the start of
+        the query is still visited, which for short prefixes is most of
+        the index: on a million names a lookup takes tens to over a
+        hundred milliseconds, wherever the typo is.
+        """
+        query = normalize(text)
+        cap = max_distance + 1
+        rows = [[min(j, cap) for j in range(len(query) + 1)]]
+        previous = ""
+        matches = []
+
+        i = 0
+        while i < len(self.keys):
+            key = self.keys[i]
+            common = common_prefix_length(previous, key, len(rows) - 1)
+            del rows[common + 1:]
+
+            for depth in range(common, len(key)):
+                rows.append(next_row(rows[-1], depth + 1, key[depth], query, cap))
+                if min(rows[-1]) > max_distance:
+                    previous = key[:depth + 1]
+                    i = self.skip(previous, i)
+                    break
+            else:
+                if rows[-1][-1] <= max_distance:
+                    matches.append((rows[-1][-1], key, i))
+                previous = key
+                i += 1
+
+        matches.sort()
+        return [self.candidate(i, distance) for distance, _, i in matches[:limit]]
+
+    def skip(self, prefix, i):
+        """
+        Returns the position of the first key after i that does not start
+        with `prefix`, galloping forward since most runs are short.
+        """
+        step = 1
+        while i + step < len(self.keys) and self.keys[i + step].startswith(prefix):
+            step *= 2
+        return bisect_left(self.keys, prefix + LAST_CHARACTER,
+                           i + step // 2, min(i + step, len(self.keys)))
+
+
+def next_row(row, i, character, query, cap):
+    """
+    Computes row i of the Levenshtein table between a key and `query`
+    from the row before it, where `character` is the key's ith character.
+
+    Distances are capped at `cap`, so only the diagonal band of cells
+    that could still be below it needs computing.
+    """
+    result = [cap] * len(row)
+    if i < cap:
+        result[0] = i
+    for j in range(max(1, i - cap + 1), min(len(row), i + cap)):
+        result[j] = min(
+            row[j] + 1,
+            result[j - 1] + 1,
+            row[j - 1] + (character != query[j - 1]),
+            cap
+        )
+    return result
+
+
+def common_prefix_length(a, b, limit):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y or length == limit:
+            break
+        length += 1
+    return length
+
+
+def normalize(name):
+    """
+    Folds case, strips accents and collapses whitespace so that
+    lookups match names regardless of how they were typed.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
@@ -0,0 +1,214 @@
+import os
+import pickle
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+
+class SourceTree():
+    """
+    Breadth-first search tree of everyone reachable from one person.
+
+    For each reached person, `distances` holds their degrees of separation
+    from the source and `steps` the (movie, person) pair leading one step
+    back towards it. On the compact graph both are arrays indexed by
+    person with -1 marking people who cannot be reached; otherwise they
+    are dicts keyed by IMDB id.
+    """
+
+    def __init__(self, source, distances, steps):
+        self.source = source
+        self.distances = distances
+        self.steps = steps
+
+    @classmethod
+    def build(cls, source, neighbors, size=None):
+        """
+        Runs one breadth-first search from `source`, using `neighbors` to list
+        the (movie, person) pairs connected to a person. Pass `size`, the
+        number of people, to store the tree in arrays of integer indices.
+        """
+        if size is None:
+            distances = {source: 0}
+            steps = {source: None}
+        else:
+            distances = array("i", [-1]) * size
+            steps = array("i", [-1]) * (2 * size)
+            distances[source] = 0
+
+        frontier = [source]
+        distance = 0
+        while frontier:
+            distance += 1
+            nextFrontier = []
+            for person in frontier:
+                for movie, neighbor in neighbors(person):
+                    if size is None:
+                        if neighbor in distances:
+                            continue
+                        steps[neighbor] = (movie, person)
+                    else:
+                        if distances[neighbor] != -1:
+                            continue
+                        steps[2 * neighbor] = movie
+                        steps[2 * neighbor + 1] = person
+                    distances[neighbor] = distance
+                    nextFrontier.append(neighbor)
+            frontier = nextFrontier
+
+        return cls(source, distances, steps)
+
+    def distance(self, person):
+        """
+        Returns the degrees of separation between the source and `person`,
+        or None if they are not connected.
+        """
+        if isinstance(self.distances, dict):
+            return self.distances.get(person)
+        distance = self.distances[person]
+        return None if distance == -1 else distance
+
+    def step(self, person):
+        if isinstance(self.steps, dict):
+            return self.steps[person]
+        return self.steps[2 * person], self.steps[2 * person + 1]
+
+    def path_to(self, target):
+        """
+        Returns the list of (movie, person) pairs connecting the source
+        to `target`, or None if they are not connected.
+        """
+        if self.distance(target) is None:
+            return None
+        path = []
+        current = target
+        while current != self.source:
+            movie, parent = self.step(current)
+            path.append((movie, current))
+            current = parent
+        path.reverse()
+        return path
+
+    def path_from(self, source):
+        """
+        Returns the list of (movie, person) pairs connecting `source`
+        to the root of the tree, or None if they are not connected.
+        """
+        if self.distance(source) is None:
+            return None
+        path = []
+        current = source
+        while current != self.source:
+            movie, parent = self.step(current)
+            path.append((movie, parent))
+            current = parent
+        return path
+
+    def histogram(self):
+        """
+        Returns a list counting how many people are at each degree of
+        separation from the source, starting from the source itself.
+        """
+        counts = []
+        distances = self.distances.values() if isinstance(self.distances, dict) else self.distances
+        for distance in distances:
+            if distance == -1:
+                continue
+            while len(counts) <= distance:
+                counts.append(0)
+            counts[distance] += 1
+        return counts
+
+    def nbytes(self):
+        """
+        Estimates the memory held by the tree.
+        """
+        if isinstance(self.distances, dict):
+            return (sys.getsizeof(self.distances) + sys.getsizeof(self.steps)
+                    + len(self.steps) * sys.getsizeof((0, 0)))
+        return (len(self.distances) * self.distances.itemsize
+                + len(self.steps) * self.steps.itemsize)
+
+
+class TreeCache():
+    """
+    Least recently used cache of source trees holding at most `budget`
+    bytes in memory. When given a `directory`, trees are also written
+    there so later runs can load them instead of searching again;
+    `signature` identifies the dataset they were built from.
+
+    The cache may be shared between threads, such as those of the HTTP
+    server; its bookkeeping is guarded by a lock, but trees are built
+    outside it so one slow search does not hold up the others.
+    """
+
+    def __init__(self, budget, directory=None, signature=None):
+        self.budget = budget
+        self.directory = directory
+        self.signature = signature
+        self.trees = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def peek(self, source):
+        """
+        Returns the tree for `source` if it is held in memory, otherwise None.
+        """
+        with self.lock:
+            tree = self.trees.get(source)
+            if tree is not None:
+                self.trees.move_to_end(source)
+            return tree
+
+    def get(self, source, build):
+        """
+        Returns the tree for `source`, loading it from disk or calling
+        build(source) to construct it if it is not already in memory.
+        """
+        tree = self.peek(source)
+        if tree is not None:
+            return tree
+
+        tree = self.load(source)
+        if tree is None:
+            tree = build(source)
+            self.save(source, tree)
+
+        with self.lock:
+            # Another thread may have cached the same tree meanwhile
+            cached = self.trees.get(source)
+            if cached is not None:
+                self.trees.move_to_end(source)
+                return cached
+            self.trees[source] = tree
+            self.size += tree.nbytes()
+
+            # Evict least recently used trees, but always keep the newest one
+            while self.size > self.budget and len(self.trees) > 1:
+                _, evicted = self.trees.popitem(last=False)
+                self.size -= evicted.nbytes()
+        return tree
+
+    def path(self, source):
+        return os.path.join(self.directory, f"{source}.tree")
+
+    def load(self, source):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(source), "rb") as f:
+                signature, tree = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return tree if signature == self.signature else None
+
+    def save(self, source, tree):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Threads saving the same tree at once each write their own file
+        temporary = f"{self.path(source)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump((self.signature, tree), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path(source))
@@ -1,4 +1,13 @@
+import heapq
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+
+
 class Node():
+    __slots__ = ("state", "parent", "action")
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -9,52 +18,109 @@ class StackFrontier():
     def __init__(self):
         self.frontier = []
 
+        # Counts how many nodes in the frontier have each state
+        self.states = {}
+
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
 
+    def __len__(self):
+        return len(self.frontier)
+
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard(node.state)
             return node
 
+    def discard(self, state):
+        remaining = self.states[state] - 1
+        if remaining:
+            self.states[state] = remaining
+        else:
+            del self.states[state]
+
 
 class QueueFrontier(StackFrontier):
+    def __init__(self):
+        super().__init__()
+        self.frontier = deque()
 
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard(node.state)
             return node
 
 
-class Queue():
-    def __init__(self):
-        self.frontier = []
+class PriorityFrontier(StackFrontier):
+    """
+    Frontier that removes the node with the lowest priority(node) first,
+    breaking ties in the order nodes were added.
+    """
 
-    def add(self, node):
-        self.frontier.append(node)
-
-    def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+    def __init__(self, priority):
+        super().__init__()
+        self.priority = priority
+        self.counter = count()
 
-    def empty(self):
-        return len(self.frontier) == 0
+    def add(self, node):
+        heapq.heappush(self.frontier, (self.priority(node), next(self.counter), node))
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
-            return node
\ No newline at end of file
+            node = heapq.heappop(self.frontier)[2]
+            self.discard(node.state)
+            return node
+
+
+class SearchStats():
+    """
+    Counts the work searches do and the wall time spent in each phase.
+    """
+
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.neighbor_calls = 0
+        self.frontier_peak = 0
+        self.phases = {}
+
+    def frontier(self, size):
+        if size > self.frontier_peak:
+            self.frontier_peak = size
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def report(self):
+        lines = [
+            f"Nodes expanded: {self.nodes_expanded}",
+            f"Neighbor calls: {self.neighbor_calls}",
+            f"Frontier peak: {self.frontier_peak}",
+        ]
+        for name, seconds in self.phases.items():
+            lines.append(f"Time in {name}: {seconds * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+# Kept for existing callers
+Queue = QueueFrontier
@@ -1,6 +1,15 @@
+import argparse
 import csv
 import itertools
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+
+from inference import eliminate, gene_table, inheritance_table, trait_table, vectorize
+from pedigree import Pedigree
+from sampling import TARGET_ESS, Estimate, gibbs, likelihood_weighting
 
 PROBS = {
 
@@ -37,12 +46,159 @@ PROBS = {
 }
 
 
+# Columns written by batch inference, one row per person. Standard errors
+# and the family's effective sample size are only filled in by sampling
+# methods, and `error` only for families that could not be inferred.
+BATCH_FIELDS = [
+    "family", "person", "gene_2", "gene_1", "gene_0", "trait",
+    "gene_2_se", "gene_1_se", "gene_0_se", "trait_se", "ess", "error"
+]
+
+# Ways of computing everyone's gene and trait probabilities, by name.
+# Sampling methods return an Estimate, which includes standard errors.
+METHODS = {
+    "enumerate": lambda people, args: enumerate_probabilities(people),
+    "vectorize": lambda people, args: vectorize(people, PROBS),
+    "eliminate": lambda people, args: eliminate(people, PROBS),
+    "weighting": lambda people, args: likelihood_weighting(
+        people, PROBS, target_ess=args.ess, seed=args.seed
+    ),
+    "gibbs": lambda people, args: gibbs(people, PROBS, target_ess=args.ess, seed=args.seed),
+}
+
+
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Infer gene and trait probabilities in a family.")
+    parser.add_argument("data", nargs="?", help="CSV file describing the family")
+    parser.add_argument("--batch", metavar="SOURCE",
+                        help="infer every family in SOURCE, a directory of CSV files or a "
+                             "manifest listing one per line, instead of a single family")
+    parser.add_argument("--output", default="-",
+                        help="CSV file batch results are written to (default: standard output)")
+    parser.add_argument("--workers", type=int,
+                        help="number of processes for batch inference (default: one per CPU)")
+    parser.add_argument("--method", choices=list(METHODS), default="eliminate",
+                        help="inference method: enumerate every assignment one at a time "
+                             "or in NumPy blocks, eliminate variables exactly in time "
+                             "linear in the size of the family, or estimate by likelihood "
+                             "weighting or Gibbs sampling")
+    parser.add_argument("--ess", type=float, default=TARGET_ESS,
+                        help="effective sample size sampling methods stop at")
+    parser.add_argument("--seed", type=int, help="random seed for sampling methods")
+    args = parser.parse_args()
+    if args.batch:
+        run_batch(args.batch, args.output, args)
+        return
+    if args.data is None:
+        parser.error("a data file or --batch is required")
+    people = load_data(args.data)
+
+    try:
+        probabilities = METHODS[args.method](people, args)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    errors = None
+    if isinstance(probabilities, Estimate):
+        print(f"Effective sample size: {probabilities.ess:.0f}")
+        probabilities, errors = probabilities.probabilities, probabilities.errors
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}")
+
+
+def run_batch(source, output, args):
+    """
+    Infer probabilities for every family in `source`, writing one row per
+    person in the columns of BATCH_FIELDS to the file `output` ("-" for
+    standard output) in the order the families are listed.
+
+    Families are handed out to a pool of args.workers processes (one per
+    CPU by default) that stay running between families. A family that
+    cannot be read or inferred gets a single row giving the error.
+    """
+    paths = family_paths(source)
+    workers = args.workers or os.cpu_count()
+    with (nullcontext(sys.stdout) if output == "-" else open(output, "w", newline="")) as f:
+        writer = csv.writer(f)
+        writer.writerow(BATCH_FIELDS)
+        if workers == 1 or len(paths) < 2:
+            for path in paths:
+                writer.writerows(infer_family(path, args))
+            return
+        with ProcessPoolExecutor(workers) as executor:
+            chunksize = max(1, len(paths) // (16 * workers))
+            for rows in executor.map(infer_family, paths, repeat(args), chunksize=chunksize):
+                writer.writerows(rows)
+
+
+def family_paths(source):
+    """
+    Return the family CSV files in a directory, or listed one per line in
+    a manifest file, ignoring blank lines and lines starting with #.
+    Relative paths in a manifest are relative to the manifest itself.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, filename) for filename in os.listdir(source)
+            if filename.endswith(".csv")
+        )
+    directory = os.path.dirname(source)
+    with open(source) as f:
+        return [
+            os.path.join(directory, line.strip()) for line in f
+            if line.strip() and not line.strip().startswith("#")
+        ]
+
+
+def infer_family(path, args):
+    """
+    Return the BATCH_FIELDS rows for every person in the family in `path`.
+    """
+    try:
+        people = load_data(path)
+        probabilities = METHODS[args.method](people, args)
+    except (OSError, KeyError, ValueError, csv.Error) as e:
+        return [[path] + [""] * (len(BATCH_FIELDS) - 2) + [f"{type(e).__name__}: {e}"]]
+
+    errors = None
+    if isinstance(probabilities, Estimate):
+        ess = probabilities.ess
+        probabilities, errors = probabilities.probabilities, probabilities.errors
+
+    rows = []
+    for person in people:
+        gene = probabilities[person]["gene"]
+        row = [path, person, gene[2], gene[1], gene[0], probabilities[person]["trait"][True]]
+        if errors is None:
+            row += ["", "", "", "", ""]
+        else:
+            row += [errors[person]["gene"][2], errors[person]["gene"][1],
+                    errors[person]["gene"][0], errors[person]["trait"][True], ess]
+        rows.append(row + [""])
+    return rows
+
+
+def enumerate_probabilities(people):
+    """
+    Return the gene and trait probabilities of everyone in `people` by
+    summing the joint probability of every assignment of genes and traits
+    consistent with what is known.
+
+    Assignments are generated by Pedigree.assignments, which works out
+    each joint probability as it goes rather than calling joint_probability.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -60,38 +216,18 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
+    # Loop over every assignment consistent with the known traits, one at a time
+    assignments = Pedigree(people).assignments(
+        gene_table(PROBS), trait_table(PROBS), inheritance_table(PROBS)
+    )
+    for one_gene, two_genes, have_trait, p in assignments:
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+        # Update probabilities with new joint probability
+        update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
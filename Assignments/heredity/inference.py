@@ -0,0 +1,326 @@
+import numpy as np
+
+from pedigree import Pedigree
+
+# Gene counts in the order they are indexed in NumPy tables
+GENES = (0, 1, 2)
+
+# Gene assignments evaluated at once when enumerating with NumPy
+BLOCK = 1 << 15
+
+# Most people exact inference will multiply into one table, which holds
+# 3 ** MAX_CLIQUE probabilities
+MAX_CLIQUE = 14
+
+
+def gene_table(probs):
+    """
+    Return P(gene count) for a person without parents in the data.
+    """
+    return np.array([probs["gene"][gene] for gene in GENES])
+
+
+def trait_table(probs):
+    """
+    Return a (3, 2) table of P(trait | gene count), indexed by gene
+    count and then by whether the person has the trait.
+    """
+    return np.array([[probs["trait"][gene][False], probs["trait"][gene][True]] for gene in GENES])
+
+
+def inheritance_table(probs):
+    """
+    Return a (3, 3, 3) table of P(child's gene count | mother's, father's),
+    indexed by the mother's, father's and child's gene counts.
+
+    A parent passes the gene on with probability 0.5 if they have one copy;
+    otherwise they pass on whatever they have, which mutates with
+    probability probs["mutation"].
+    """
+    mutation = probs["mutation"]
+    passes = np.array([mutation, 0.5, 1 - mutation])
+    mother = passes[:, None]
+    father = passes[None, :]
+    return np.stack([
+        (1 - mother) * (1 - father),
+        mother * (1 - father) + (1 - mother) * father,
+        mother * father
+    ], axis=-1)
+
+
+def evidence(trait, traits):
+    """
+    Return the likelihood of what is known about a person's trait, 1 or 0
+    or -1 if unknown as in Pedigree.traits, for each possible gene count.
+    """
+    if trait < 0:
+        return np.ones(len(GENES))
+    return traits[:, trait]
+
+
+def joint_probabilities(pedigree, genes, traits, probs):
+    """
+    Return the joint probability of each of a block of assignments at once.
+
+    `genes` is an (B, n) integer array of the gene count of each of the
+    n people in a Pedigree for each of B assignments; `traits` is an
+    array of the same shape (or one that broadcasts to it) of 1 for
+    having the trait, 0 for not and -1 to leave it out of the joint.
+    """
+    children = np.flatnonzero(pedigree.mothers >= 0)
+    founders = np.flatnonzero(pedigree.mothers < 0)
+
+    probabilities = np.empty(genes.shape)
+    probabilities[:, founders] = gene_table(probs)[genes[:, founders]]
+    probabilities[:, children] = inheritance_table(probs)[
+        genes[:, pedigree.mothers[children]], genes[:, pedigree.fathers[children]],
+        genes[:, children]
+    ]
+    traits = np.broadcast_to(traits, genes.shape)
+    probabilities *= np.where(traits < 0, 1, trait_table(probs)[genes, np.maximum(traits, 0)])
+    return probabilities.prod(axis=1)
+
+
+def vectorize(people, probs, block=BLOCK):
+    """
+    Return the same probabilities as enumerating every assignment, by
+    evaluating `block` gene assignments at a time with joint_probabilities.
+
+    Assignments are the numbers 0..3^n - 1 written in base 3, one digit
+    per person. Unknown traits are left out of the joint and recovered
+    from the gene probabilities afterwards, since the chance of having
+    the trait depends on nothing but a person's own genes.
+    """
+    pedigree = Pedigree(people)
+    count = len(pedigree)
+    powers = 3 ** np.arange(count, dtype=np.int64)
+    offsets = len(GENES) * np.arange(count)
+
+    totals = np.zeros(len(GENES) * count)
+    for start in range(0, 3 ** count, block):
+        codes = np.arange(start, min(start + block, 3 ** count), dtype=np.int64)
+        genes = codes[:, None] // powers % 3
+        joint = joint_probabilities(pedigree, genes, pedigree.traits, probs)
+        totals += np.bincount((genes + offsets).ravel(), weights=np.repeat(joint, count),
+                              minlength=len(totals))
+
+    totals = totals.reshape(count, len(GENES))
+    totals /= totals.sum(axis=1, keepdims=True)
+    return {
+        name: distribution(person, dict(zip(GENES, totals[i].tolist())), probs)
+        for i, (name, person) in enumerate(people.items())
+    }
+
+
+def eliminate(people, probs):
+    """
+    Return the probability of each gene count and of having the trait for
+    every person, in the same dictionary form heredity.main builds, by
+    exact inference over the Bayesian network of the pedigree.
+
+    Each person's gene count is a variable, with a factor relating it to
+    their parents' gene counts (or a prior, for people without parents)
+    weighted by the likelihood of their trait if it is known. Eliminating
+    the variables one at a time builds a clique tree; passing messages up
+    and then back down it gives every person's marginal in two sweeps,
+    in time linear in the size of the family for tree-like pedigrees.
+    """
+    pedigree = Pedigree(people)
+    names = pedigree.names
+    prior = gene_table(probs)
+    traits = trait_table(probs)
+    inheritance = inheritance_table(probs)
+
+    factors = []
+    for i in range(len(pedigree)):
+        likelihood = evidence(pedigree.traits[i], traits)
+        if pedigree.mothers[i] >= 0:
+            scope = (int(pedigree.mothers[i]), int(pedigree.fathers[i]), i)
+            factors.append((scope, inheritance * likelihood))
+        else:
+            factors.append(((i,), prior * likelihood))
+
+    cliques = clique_tree(len(names), [scope for scope, _ in factors])
+
+    # Messages up the tree, from each clique to the one that eliminated
+    # its separator, in the order the cliques were built
+    up = [None] * len(cliques)
+    for j, clique in enumerate(cliques):
+        if clique.parent is not None:
+            up[j] = contract(clique, cliques, factors, up, None, clique.children, clique.separator)
+
+    # Messages back down, from each clique's parent
+    down = [None] * len(cliques)
+    for j in reversed(range(len(cliques))):
+        clique = cliques[j]
+        if clique.parent is None:
+            continue
+        parent = cliques[clique.parent]
+        siblings = [child for child in parent.children if child != j]
+        down[j] = contract(parent, cliques, factors, up, down[clique.parent], siblings,
+                           clique.separator)
+
+    probabilities = {}
+    for clique in cliques:
+        marginal = contract(clique, cliques, factors, up, down[clique.index],
+                            clique.children, (clique.variable,))
+        gene = dict(zip(GENES, marginal.tolist()))
+        probabilities[names[clique.variable]] = gene
+
+    return {
+        name: distribution(people[name], probabilities[name], probs)
+        for name in names
+    }
+
+
+def distribution(person, gene, probs):
+    """
+    Return the gene and trait distribution of a person from the probability
+    of each of their gene counts.
+    """
+    if person["trait"] is None:
+        hasTrait = sum(gene[count] * probs["trait"][count][True] for count in GENES)
+    else:
+        hasTrait = float(person["trait"])
+    return {
+        "gene": {count: gene[count] for count in reversed(GENES)},
+        "trait": {True: hasTrait, False: 1 - hasTrait}
+    }
+
+
+class Clique():
+    """
+    Node of a clique tree: the variables in `scope` were multiplied together
+    to eliminate `variable`, leaving a message over `separator` for
+    `parent`. `factors` are the indices of the original factors assigned
+    to it and `children` the cliques whose messages it received.
+    """
+
+    def __init__(self, index, variable, scope, factors, children):
+        self.index = index
+        self.variable = variable
+        self.scope = scope
+        self.factors = factors
+        self.children = children
+        self.separator = tuple(v for v in scope if v != variable)
+        self.parent = None
+
+
+def clique_tree(count, scopes):
+    """
+    Return the cliques built by eliminating `count` variables from factors
+    over `scopes`, children always coming before their parents.
+    """
+    order = elimination_order(count, scopes)
+
+    # Factors and messages still waiting to be used, by the variables
+    # they mention
+    items = list(scopes)
+    owners = [None] * len(scopes)
+    holding = [set() for _ in range(count)]
+    for item, scope in enumerate(scopes):
+        for variable in scope:
+            holding[variable].add(item)
+
+    cliques = []
+    for variable in order:
+        used = holding[variable]
+        scope = set()
+        for item in used:
+            scope.update(items[item])
+            for other in items[item]:
+                if other != variable:
+                    holding[other].discard(item)
+        holding[variable] = set()
+
+        if len(scope) > MAX_CLIQUE:
+            raise ValueError(
+                f"pedigree is too interconnected for exact inference "
+                f"(needs a table over {len(scope)} people)"
+            )
+        clique = Clique(
+            len(cliques), variable, tuple(sorted(scope)),
+            [item for item in used if owners[item] is None],
+            [owners[item] for item in used if owners[item] is not None]
+        )
+        for child in clique.children:
+            cliques[child].parent = clique.index
+        cliques.append(clique)
+
+        # Pass what is left on as a new item for later cliques to use
+        if clique.separator:
+            items.append(clique.separator)
+            owners.append(clique.index)
+            for other in clique.separator:
+                holding[other].add(len(items) - 1)
+
+    return cliques
+
+
+def elimination_order(count, scopes):
+    """
+    Return an order to eliminate variables in, greedily choosing the one
+    with the fewest neighbours (joining them into the smallest clique)
+    each time.
+    """
+    neighbours = [set() for _ in range(count)]
+    for scope in scopes:
+        for variable in scope:
+            neighbours[variable].update(scope)
+    for variable in range(count):
+        neighbours[variable].discard(variable)
+
+    # Buckets of remaining variables by number of neighbours
+    buckets = {}
+    for variable in range(count):
+        buckets.setdefault(len(neighbours[variable]), set()).add(variable)
+
+    order = []
+    remaining = set(range(count))
+    while remaining:
+        size = min(size for size, bucket in buckets.items() if bucket)
+        variable = buckets[size].pop()
+        order.append(variable)
+        remaining.discard(variable)
+
+        # Connect the neighbours of the eliminated variable to each other
+        joined = neighbours[variable]
+        for other in joined:
+            buckets[len(neighbours[other])].discard(other)
+            neighbours[other].discard(variable)
+            neighbours[other].update(joined - {other})
+            buckets.setdefault(len(neighbours[other]), set()).add(other)
+    return order
+
+
+def contract(clique, cliques, factors, up, down, children, output):
+    """
+    Multiply a clique's factors by the messages from `children` and from
+    its parent (`down`, if given), and sum out everything except the
+    variables in `output`. The result is normalized to sum to 1, which
+    keeps long chains of messages from underflowing.
+    """
+    operands = []
+    for item in clique.factors:
+        scope, values = factors[item]
+        operands += [values, list(scope)]
+    for child in children:
+        operands += [up[child], list(cliques[child].separator)]
+    if down is not None:
+        operands += [down, list(clique.separator)]
+
+    # A variable may only have been mentioned by the message being left
+    # out, in which case nothing is known about it from the rest
+    mentioned = set()
+    for i in range(1, len(operands), 2):
+        mentioned.update(operands[i])
+    for variable in output:
+        if variable not in mentioned:
+            operands += [np.ones(len(GENES)), [variable]]
+
+    # np.einsum numbers axes from 0, so relabel variables within the clique
+    labels = {variable: i for i, variable in enumerate(clique.scope)}
+    for i in range(1, len(operands), 2):
+        operands[i] = [labels[variable] for variable in operands[i]]
+    result = np.einsum(*operands, [labels[variable] for variable in output])
+    return result / result.sum()
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class Pedigree():
+    """
+    Family from load_data compiled to integer ids.
+
+    Person i is names[i]; their parents are mothers[i] and fathers[i], or
+    -1 for people without parents in the data; traits[i] is 1 or 0 if it
+    is known whether they have the trait and -1 otherwise. `order` lists
+    everyone with parents before their children.
+    """
+
+    def __init__(self, people):
+        self.names = list(people)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.mothers = np.full(len(self.names), -1)
+        self.fathers = np.full(len(self.names), -1)
+        self.traits = np.full(len(self.names), -1)
+        for i, person in enumerate(people.values()):
+            if person["mother"] is not None and person["father"] is not None:
+                self.mothers[i] = self.index[person["mother"]]
+                self.fathers[i] = self.index[person["father"]]
+            if person["trait"] is not None:
+                self.traits[i] = int(person["trait"])
+        self.order = self.topological_order()
+
+    def __len__(self):
+        return len(self.names)
+
+    def topological_order(self):
+        """
+        Return every person's id, parents before their children.
+        """
+        children = [[] for _ in self.names]
+        waiting = [0] * len(self.names)
+        for child in np.flatnonzero(self.mothers >= 0).tolist():
+            for parent in (self.mothers[child], self.fathers[child]):
+                children[parent].append(child)
+                waiting[child] += 1
+
+        order = [person for person in range(len(self.names)) if not waiting[person]]
+        for person in order:
+            for child in children[person]:
+                waiting[child] -= 1
+                if not waiting[child]:
+                    order.append(child)
+        if len(order) != len(self.names):
+            raise ValueError("pedigree has someone among their own ancestors")
+        return order
+
+    def assignments(self, genes, traits, inheritance):
+        """
+        Yield (one_gene, two_genes, have_trait, probability) for every
+        assignment of gene counts and traits consistent with the traits
+        that are known, the sets of names as heredity.update expects.
+
+        `genes`, `traits` and `inheritance` are the tables from the
+        inference module. Each person's factor, with their trait already
+        fixed where it is known, is looked up once per assignment of their
+        parents as the people are assigned depth first in `order`, so the
+        joint probability builds up one multiplication at a time and only
+        one assignment is held in memory at once.
+        """
+        factors = []
+        for person in range(len(self.names)):
+            allowed = (0, 1) if self.traits[person] < 0 else (self.traits[person],)
+            table = traits[:, allowed]
+            if self.mothers[person] < 0:
+                factors.append((genes[:, None] * table).tolist())
+            else:
+                factors.append((inheritance[..., None] * table).tolist())
+            factors[-1] = (factors[-1], allowed)
+
+        geneCounts = [0] * len(self.names)
+        hasTraits = [False] * len(self.names)
+
+        def assign(depth, probability):
+            if depth == len(self.order):
+                yield (
+                    {self.names[i] for i, count in enumerate(geneCounts) if count == 1},
+                    {self.names[i] for i, count in enumerate(geneCounts) if count == 2},
+                    {self.names[i] for i, trait in enumerate(hasTraits) if trait},
+                    probability
+                )
+                return
+
+            person = self.order[depth]
+            table, allowed = factors[person]
+            if self.mothers[person] >= 0:
+                table = table[geneCounts[self.mothers[person]]][geneCounts[self.fathers[person]]]
+            for count in range(3):
+                geneCounts[person] = count
+                for column, trait in enumerate(allowed):
+                    hasTraits[person] = bool(trait)
+                    yield from assign(depth + 1, probability * table[count][column])
+
+        yield from assign(0, 1.0)
@@ -0,0 +1,273 @@
+from collections import namedtuple
+
+import numpy as np
+
+from inference import GENES, distribution, evidence, gene_table, inheritance_table, trait_table
+from pedigree import Pedigree
+
+# Samples likelihood weighting draws at a time, and chains Gibbs sampling runs
+CHAINS = 1000
+
+# Effective sample size sampling stops at by default
+TARGET_ESS = 10000
+
+# Gibbs sweeps discarded before estimating, and between checks of the
+# effective sample size
+BURN_IN = 100
+CHECK_EVERY = 20
+
+# Probabilities from a sampler, the standard error of each in the same
+# form, the smallest effective sample size among them and the number
+# of samples (or Gibbs sweeps of every chain) taken
+Estimate = namedtuple("Estimate", ["probabilities", "errors", "ess", "samples"])
+
+
+def likelihood_weighting(people, probs, target_ess=TARGET_ESS, max_samples=10 ** 6,
+                         chains=CHAINS, seed=None):
+    """
+    Estimate everyone's gene and trait probabilities by likelihood weighting.
+
+    Gene counts are sampled from the prior, a generation at a time for
+    `chains` samples at once, and each sample is weighted by how likely
+    it makes the traits that are known. Sampling stops once the weights
+    are worth `target_ess` unweighted samples, or after `max_samples`.
+    When the known traits are unlikely a priori, few samples carry any
+    weight and Gibbs sampling is the better choice.
+    """
+    pedigree = Pedigree(people)
+    rng = np.random.default_rng(seed)
+    traits = trait_table(probs)
+    likelihoods = np.array([evidence(trait, traits) for trait in pedigree.traits])
+    everyone = np.arange(len(pedigree))
+
+    # Running sums of the weights and their squares, and of each estimated
+    # quantity times its weight, its squared weight and both squared
+    weight = weightSquared = 0.0
+    weighted, squareWeighted, squares = (np.zeros((len(pedigree), len(GENES) + 1)) for _ in range(3))
+
+    samples = 0
+    ess = 0.0
+    while samples < max_samples:
+        genes = sample_prior(pedigree, probs, chains, rng)
+        weights = likelihoods[everyone, genes].prod(axis=1)[:, None, None]
+        x = np.concatenate((np.eye(len(GENES))[genes], traits[genes, 1:]), axis=-1)
+
+        weight += weights.sum()
+        weightSquared += (weights ** 2).sum()
+        weighted += (weights * x).sum(axis=0)
+        squareWeighted += (weights ** 2 * x).sum(axis=0)
+        squares += (weights ** 2 * x ** 2).sum(axis=0)
+        samples += chains
+
+        ess = weight ** 2 / weightSquared if weightSquared else 0.0
+        if ess >= target_ess:
+            break
+
+    if not weight:
+        raise ValueError("no samples were consistent with the known traits")
+    means = weighted / weight
+    spread = squares - 2 * means * squareWeighted + means ** 2 * weightSquared
+    errors = np.sqrt(np.maximum(spread, 0)) / weight
+    return estimate(pedigree, people, probs, means, errors, ess, samples)
+
+
+def gibbs(people, probs, target_ess=TARGET_ESS, max_sweeps=20000, chains=CHAINS, seed=None):
+    """
+    Estimate everyone's gene and trait probabilities by Gibbs sampling.
+
+    `chains` independent chains are run side by side, each sweep
+    resampling every person's gene count given everyone else's. People
+    who share no child and are not parent and child are independent given
+    the rest, so each group of them is resampled at once in every chain.
+    The distributions gene counts are drawn from are averaged, rather than
+    the draws themselves, and standard errors come from how much the
+    chains disagree. Sampling stops once every estimate is worth
+    `target_ess` independent samples, or after `max_sweeps`.
+    """
+    pedigree = Pedigree(people)
+    rng = np.random.default_rng(seed)
+    traits = trait_table(probs)
+    with np.errstate(divide="ignore"):
+        logPrior = np.log(gene_table(probs))
+        logInheritance = np.log(inheritance_table(probs))
+        logLikelihoods = np.log(np.array([evidence(trait, traits) for trait in pedigree.traits]))
+    groups = [Group(pedigree, members) for members in colour_groups(pedigree)]
+
+    genes = sample_prior(pedigree, probs, chains, rng).T.copy()
+    chainSums = np.zeros((len(pedigree), chains, len(GENES) + 1))
+    squares = np.zeros((len(pedigree), len(GENES) + 1))
+    sweeps = 0
+    for sweep in range(BURN_IN + max_sweeps):
+        for group in groups:
+            conditional = group.conditional(genes, logPrior, logInheritance, logLikelihoods)
+            genes[group.members] = draw(conditional, rng)
+            if sweep >= BURN_IN:
+                x = np.concatenate((conditional, conditional @ traits[:, 1:]), axis=-1)
+                chainSums[group.members] += x
+                squares[group.members] += (x ** 2).sum(axis=1)
+
+        if sweep >= BURN_IN:
+            sweeps += 1
+            if sweeps % CHECK_EVERY == 0 and chain_statistics(chainSums, squares, sweeps)[2] >= target_ess:
+                break
+
+    if not sweeps:
+        raise ValueError("max_sweeps must be at least 1")
+    means, errors, ess = chain_statistics(chainSums, squares, sweeps)
+    return estimate(pedigree, people, probs, means, errors, ess, sweeps)
+
+
+class Group():
+    """
+    People Gibbs sampling resamples at once, with the indices needed to
+    work out the distribution of their gene counts given everyone else's.
+    """
+
+    def __init__(self, pedigree, members):
+        self.members = np.array(members)
+        self.founders = np.flatnonzero(pedigree.mothers[self.members] < 0)
+        self.children = np.flatnonzero(pedigree.mothers[self.members] >= 0)
+        self.mothers = pedigree.mothers[self.members[self.children]]
+        self.fathers = pedigree.fathers[self.members[self.children]]
+
+        # Every child of a member, with the member's position in the group
+        # and whether the member is the child's mother (0), father (1) or both (2)
+        position = {person: i for i, person in enumerate(members)}
+        self.links = {role: ([], []) for role in range(3)}
+        for child in np.flatnonzero(pedigree.mothers >= 0).tolist():
+            mother, father = int(pedigree.mothers[child]), int(pedigree.fathers[child])
+            if mother == father:
+                roles = ((mother, 2),)
+            else:
+                roles = ((mother, 0), (father, 1))
+            for parent, role in roles:
+                if parent in position:
+                    self.links[role][0].append(position[parent])
+                    self.links[role][1].append(child)
+        self.links = {
+            role: (np.array(slots, dtype=np.int64), np.array(kids, dtype=np.int64),
+                   pedigree.mothers[kids], pedigree.fathers[kids])
+            for role, (slots, kids) in self.links.items() if slots
+        }
+
+    def conditional(self, genes, logPrior, logInheritance, logLikelihoods):
+        """
+        Return a (members, chains, 3) array of the probability of each gene
+        count for each member in each chain, given everyone else's in
+        `genes`, a (people, chains) array.
+        """
+        logs = np.empty((len(self.members), genes.shape[1], len(GENES)))
+        logs[self.founders] = logPrior
+        logs[self.children] = logInheritance[genes[self.mothers], genes[self.fathers]]
+        logs += logLikelihoods[self.members][:, None, :]
+
+        # Multiply in how likely each gene count makes each child's genes
+        for role, (slots, kids, mothers, fathers) in self.links.items():
+            if role == 0:
+                factors = np.moveaxis(logInheritance[:, genes[fathers], genes[kids]], 0, -1)
+            elif role == 1:
+                factors = logInheritance[genes[mothers], :, genes[kids]]
+            else:
+                factors = np.moveaxis(logInheritance[GENES, GENES][:, genes[kids]], 0, -1)
+            np.add.at(logs, slots, factors)
+
+        logs -= logs.max(axis=-1, keepdims=True)
+        probabilities = np.exp(logs)
+        return probabilities / probabilities.sum(axis=-1, keepdims=True)
+
+
+def sample_prior(pedigree, probs, count, rng):
+    """
+    Return a (count, people) array of gene counts drawn from the prior,
+    ignoring what is known about anyone's traits.
+    """
+    prior = gene_table(probs)
+    inheritance = inheritance_table(probs)
+    genes = np.empty((count, len(pedigree)), dtype=np.int64)
+    for generation in generations(pedigree):
+        if pedigree.mothers[generation[0]] < 0:
+            rows = np.broadcast_to(prior, (count, len(generation), len(GENES)))
+        else:
+            rows = inheritance[genes[:, pedigree.mothers[generation]],
+                               genes[:, pedigree.fathers[generation]]]
+        genes[:, generation] = draw(rows, rng)
+    return genes
+
+
+def generations(pedigree):
+    """
+    Return arrays of people who can be sampled together: first everyone
+    without parents, then each generation whose parents all came before.
+    """
+    depth = np.zeros(len(pedigree), dtype=np.int64)
+    for person in pedigree.order:
+        if pedigree.mothers[person] >= 0:
+            depth[person] = 1 + max(depth[pedigree.mothers[person]], depth[pedigree.fathers[person]])
+    return [np.flatnonzero(depth == level) for level in range(depth.max() + 1)] if len(depth) else []
+
+
+def colour_groups(pedigree):
+    """
+    Return lists of people no two of whom are neighbours in the moral
+    graph of the pedigree, so each list can be Gibbs sampled at once.
+    """
+    neighbours = [set() for _ in range(len(pedigree))]
+    for child in np.flatnonzero(pedigree.mothers >= 0).tolist():
+        family = {child, int(pedigree.mothers[child]), int(pedigree.fathers[child])}
+        for person in family:
+            neighbours[person].update(family - {person})
+
+    colours = [None] * len(pedigree)
+    groups = []
+    for person in range(len(pedigree)):
+        taken = {colours[other] for other in neighbours[person]}
+        colour = next(colour for colour in range(len(groups) + 1) if colour not in taken)
+        if colour == len(groups):
+            groups.append([])
+        colours[person] = colour
+        groups[colour].append(person)
+    return groups
+
+
+def draw(probabilities, rng):
+    """
+    Return one gene count drawn from each distribution along the last
+    axis of `probabilities`.
+    """
+    cumulative = np.cumsum(probabilities, axis=-1)
+    u = rng.random(cumulative.shape[:-1] + (1,)) * cumulative[..., -1:]
+    return (u >= cumulative[..., :-1]).sum(axis=-1)
+
+
+def chain_statistics(chainSums, squares, sweeps):
+    """
+    Return the mean of every estimated quantity over all chains, its
+    standard error from the spread of the chains' own means, and the
+    smallest effective sample size among the quantities that vary.
+    """
+    chains = chainSums.shape[1]
+    chainMeans = chainSums / sweeps
+    means = chainMeans.mean(axis=1)
+    errors = chainMeans.std(axis=1, ddof=1) / np.sqrt(chains) if chains > 1 else np.zeros_like(means)
+    variance = squares / (sweeps * chains) - means ** 2
+    varies = (variance > 1e-12) & (errors > 0)
+    ess = float((variance[varies] / errors[varies] ** 2).min()) if varies.any() else float("inf")
+    return means, errors, ess
+
+
+def estimate(pedigree, people, probs, means, errors, ess, samples):
+    """
+    Return an Estimate from (people, 4) arrays of the mean and standard
+    error of the probability of each gene count and of the trait.
+    """
+    probabilities = {}
+    standardErrors = {}
+    for i, name in enumerate(pedigree.names):
+        gene = dict(zip(GENES, means[i, :len(GENES)].tolist()))
+        probabilities[name] = distribution(people[name], gene, probs)
+        traitError = 0.0 if pedigree.traits[i] >= 0 else float(errors[i, -1])
+        standardErrors[name] = {
+            "gene": {count: float(errors[i, count]) for count in reversed(GENES)},
+            "trait": {True: traitError, False: traitError}
+        }
+    return Estimate(probabilities, standardErrors, ess, samples)
@@ -0,0 +1,174 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+import pagerank
+
+# Ways of computing PageRank to time, by name. Each takes a corpus and
+# returns its ranks and the number of iterations it took, if it iterates.
+ENGINES = {
+    "sample": lambda corpus, args: (
+        pagerank.sample_pagerank(corpus, pagerank.DAMPING, args.samples, seed=args.seed), None
+    ),
+    "iterate": lambda corpus, args: solve(corpus),
+    "iterate-l1": lambda corpus, args: solve(corpus, args.tolerance, "l1"),
+    "gauss-seidel": lambda corpus, args: solve(corpus, args.tolerance, "l1", method="gauss-seidel"),
+    "quadratic": lambda corpus, args: solve(corpus, args.tolerance, "l1", extrapolation="quadratic"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PageRank engines.")
+    parser.add_argument("--pages", type=int, default=20000,
+                        help="number of pages in each synthetic corpus")
+    parser.add_argument("--links", type=float, default=8,
+                        help="average number of links on a page")
+    parser.add_argument("--samples", type=int, default=pagerank.SAMPLES * 100,
+                        help="number of samples the sampling engine takes")
+    parser.add_argument("--tolerance", type=float, default=1e-8,
+                        help="L1 tolerance for the engines that take one")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--edits", type=int, default=3,
+                        help="pages added or changed when timing incremental updates")
+    parser.add_argument("--seed", type=int, default=50)
+    args = parser.parse_args()
+
+    for label, generate in GENERATORS.items():
+        corpus = generate(args.pages, args.links, args.seed)
+        benchmark(label, corpus, args)
+        benchmark_update(corpus, args)
+
+
+def benchmark(label, corpus, args):
+    """
+    Runs every selected engine over `corpus`, reporting how long it took,
+    the most memory it allocated at once and how far its ranks are from
+    a high precision reference.
+    """
+    links = pagerank.LinkMatrix.from_corpus(corpus)
+    reference = pagerank.power_iteration(links, pagerank.DAMPING, 1e-14, "l1")
+    edges = sum(len(pageLinks) for pageLinks in corpus.values())
+    print(f"{label}: {links.size} pages, {edges} links")
+
+    for name in args.engines:
+        engine = ENGINES[name]
+        start = time.perf_counter()
+        ranks, iterations = engine(corpus, args)
+        elapsed = time.perf_counter() - start
+
+        # Tracing allocations slows everything down, so measure memory
+        # on a second, untimed run
+        tracemalloc.start()
+        engine(corpus, args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        error = np.abs(np.array([ranks[page] for page in links.pages]) - reference).sum()
+        print(f"  {name:>12}: "
+              f"{elapsed * 1000:9.1f} ms  "
+              f"peak {peak / (1 << 20):8.1f} MiB  "
+              f"iterations {'-' if iterations is None else iterations:>5}  "
+              f"L1 error {error:.2e}")
+
+
+def benchmark_update(corpus, args):
+    """
+    Edits a few pages of `corpus` and compares correcting its previous
+    ranks by pushing residuals, as update_pagerank does, with solving
+    the edited corpus from scratch. Both are timed on the same link
+    matrix, since building it costs the same either way.
+    """
+    previous = pagerank.iterate_pagerank(corpus, pagerank.DAMPING, args.tolerance, "l1")
+    edited = edit_corpus(corpus, args.edits, random.Random(args.seed))
+    links = pagerank.LinkMatrix.from_corpus(edited)
+    reference = pagerank.power_iteration(links, pagerank.DAMPING, 1e-14, "l1")
+    print(f"  after editing {args.edits} pages:")
+
+    start = time.perf_counter()
+    residuals = []
+    ranks = pagerank.power_iteration(links, pagerank.DAMPING, args.tolerance, "l1",
+                                     residuals=residuals)
+    elapsed = time.perf_counter() - start
+    print(f"  {'from scratch':>12}: {elapsed * 1000:9.1f} ms  "
+          f"sweeps {len(residuals):8.2f}  L1 error {np.abs(ranks - reference).sum():.2e}")
+
+    warm = pagerank.warm_start(links, pagerank.DAMPING, previous)
+    start = time.perf_counter()
+    ranks, pushes = pagerank.push_pagerank(links, pagerank.DAMPING, warm, args.tolerance,
+                                           rescale=True)
+    ranks /= ranks.sum()
+    elapsed = time.perf_counter() - start
+    print(f"  {'update':>12}: {elapsed * 1000:9.1f} ms  "
+          f"sweeps {pushes / links.size:8.2f}  L1 error {np.abs(ranks - reference).sum():.2e}")
+
+
+def edit_corpus(corpus, edits, rng):
+    """
+    Returns a copy of `corpus` with one page added and the links of
+    `edits` - 1 others replaced, each linking to a few random pages.
+    """
+    names = list(corpus)
+    edited = dict(corpus)
+    edited["new.html"] = set(rng.sample(names, min(5, len(names))))
+    for page in rng.sample(names, min(edits - 1, len(names))):
+        edited[page] = set(rng.sample(names, min(5, len(names)))) - {page}
+    return edited
+
+
+def solve(corpus, tolerance=0.001, norm="max", **options):
+    solution = pagerank.solve_pagerank(corpus, pagerank.DAMPING, tolerance, norm, **options)
+    return solution.ranks, solution.iterations
+
+
+def power_law_corpus(pages, links, seed):
+    """
+    Returns a corpus where the number of links on a page and the number
+    of links to it both follow power laws, so a few hub pages are linked
+    to from everywhere and a few pages link to a great many others.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+
+    # Shuffle which pages become hubs so they are not all at the start
+    popularity = names[:]
+    rng.shuffle(popularity)
+
+    # A Pareto variate with shape 2 has mean 2, so halve it to average `links`
+    corpus = {}
+    for name in names:
+        count = min(int(rng.paretovariate(2) * links / 2), pages - 1)
+        targets = set()
+        for _ in range(count):
+            targets.add(popularity[min(int(rng.paretovariate(1.1)) - 1, pages - 1)]
+                        if rng.random() < 0.5 else rng.choice(names))
+        targets.discard(name)
+        corpus[name] = targets
+    return corpus
+
+
+def random_corpus(pages, links, seed):
+    """
+    Returns a corpus where each page links to pages chosen uniformly at
+    random, some pages having no links at all.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    corpus = {}
+    for name in names:
+        count = rng.randint(0, min(round(2 * links), pages - 1))
+        corpus[name] = set(rng.sample(names, count)) - {name}
+    return corpus
+
+
+# Synthetic corpora to benchmark against, by name
+GENERATORS = {
+    "power law": power_law_corpus,
+    "random": random_corpus,
+}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+
+# Edges read into memory at a time when building or multiplying
+BLOCK_EDGES = 1 << 22
+
+# Files a MappedLinkMatrix is stored in, inside its directory
+OFFSETS = "offsets.npy"
+SOURCES = "sources.npy"
+OUTDEGREE = "outdegree.npy"
+
+
+class MappedLinkMatrix():
+    """
+    Link matrix of a corpus stored on disk as memory-mapped NumPy arrays,
+    for graphs with too many links to hold in memory.
+
+    Links are sorted by target: the pages linking to page i are
+    sources[offsets[i]:offsets[i + 1]]. Multiplying streams over them
+    BLOCK_EDGES at a time, so only vectors with one entry per page stay
+    in memory. Like LinkMatrix, pages with no links at all are treated
+    as linking to every page in the corpus, so the two can be passed to
+    power_iteration interchangeably.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.offsets = np.load(os.path.join(directory, OFFSETS), mmap_mode="r")
+        self.sources = np.load(os.path.join(directory, SOURCES), mmap_mode="r")
+        self.size = len(self.offsets) - 1
+
+        outdegree = np.load(os.path.join(directory, OUTDEGREE), mmap_mode="r")
+        self.scale = np.zeros(self.size)
+        np.divide(1, outdegree, out=self.scale, where=outdegree > 0)
+        self.dangling = np.flatnonzero(outdegree == 0)
+
+        # First page of each block of about BLOCK_EDGES links
+        self.bounds = np.unique(np.searchsorted(
+            self.offsets, np.arange(0, len(self.sources), BLOCK_EDGES), side="right"
+        ) - 1)
+
+    @classmethod
+    def build(cls, edges, size, directory):
+        """
+        Sort an (E, 2) array of (source, target) indices of `size` pages,
+        such as the memory-mapped edge list written by crawl_edges, into
+        a MappedLinkMatrix in `directory`.
+
+        The edges are counted by target in one pass and placed in a
+        second, BLOCK_EDGES at a time, so neither they nor the sorted
+        copy are ever held in memory as a whole.
+        """
+        os.makedirs(directory, exist_ok=True)
+        indegree = np.zeros(size, dtype=np.int64)
+        outdegree = np.zeros(size, dtype=np.int64)
+        for start in range(0, len(edges), BLOCK_EDGES):
+            block = np.asarray(edges[start:start + BLOCK_EDGES])
+            for degree, column in ((outdegree, block[:, 0]), (indegree, block[:, 1])):
+                pages, counts = np.unique(column, return_counts=True)
+                degree[pages] += counts
+
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(indegree, out=offsets[1:])
+        del indegree
+        np.save(os.path.join(directory, OFFSETS), offsets)
+        np.save(os.path.join(directory, OUTDEGREE), outdegree.astype(np.int32))
+
+        sources = np.lib.format.open_memmap(
+            os.path.join(directory, SOURCES), mode="w+", dtype=np.int32, shape=(len(edges),)
+        )
+        cursor = offsets[:-1]
+        for start in range(0, len(edges), BLOCK_EDGES):
+            block = np.asarray(edges[start:start + BLOCK_EDGES])
+            order = np.argsort(block[:, 1], kind="stable")
+            targets = block[order, 1]
+
+            # Place the nth link into each target after the ones before it
+            runs = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]])
+            counts = np.diff(np.r_[runs, len(targets)])
+            rank = np.arange(len(targets)) - np.repeat(runs, counts)
+            sources[cursor[targets] + rank] = block[order, 0]
+            cursor[targets[runs]] += counts
+        sources.flush()
+        del sources
+
+        return cls(directory)
+
+    def multiply(self, ranks):
+        """
+        Return the link matrix times `ranks`, a vector with one entry per page.
+        """
+        return self.multiply_rows(ranks, 0, self.size)
+
+    def multiply_rows(self, ranks, first, last):
+        """
+        Return rows first..last - 1 of the link matrix times `ranks`,
+        the new ranks of those pages before damping and teleportation.
+        """
+        weighted = ranks * self.scale
+        result = np.zeros(last - first)
+        inner = self.bounds[(self.bounds > first) & (self.bounds < last)]
+        points = np.r_[first, inner, last]
+        for start, end in zip(points[:-1], points[1:]):
+            offsets = np.asarray(self.offsets[start:end + 1])
+            if offsets[-1] == offsets[0]:
+                continue
+            contributions = weighted[self.sources[offsets[0]:offsets[-1]]]
+            linked = offsets[1:] > offsets[:-1]
+            result[start - first:end - first][linked] = np.add.reduceat(
+                contributions, offsets[:-1][linked] - offsets[0]
+            )
+        result += ranks[self.dangling].sum() / self.size
+        return result
@@ -1,17 +1,63 @@
+import math
 import os
-import random
+import pickle
 import re
 import sys
-import copy
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from mapped import MappedLinkMatrix
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Number of random surfers sample_pagerank simulates side by side
+SURFERS = 10000
+
+# Number of visits sample_pagerank tallies at a time
+BATCH = 1 << 20
+
+# Matches the target of a link in raw HTML
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Bytes of HTML read at a time when extracting links
+CHUNK_SIZE = 1 << 16
+
+# Corpora with fewer pages than this are crawled without a process pool
+PARALLEL_PAGES = 256
+
+# File parsed links are cached in, inside the corpus directory
+LINK_CACHE = ".pagerank-links.cache"
+
+# Ways of measuring how much the ranks changed in one iteration
+NORMS = {
+    "max": lambda change: np.abs(change).max(),
+    "l1": lambda change: np.abs(change).sum(),
+}
+
+# Power iteration extrapolates once the rate at which the ranks change
+# varies by less than this fraction between iterations
+EXTRAPOLATION_STEADINESS = 0.01
+
+# Number of blocks of pages a Gauss-Seidel sweep updates one after another
+GAUSS_SEIDEL_BLOCKS = 32
+
+# Ranks found by solve_pagerank, with the number of iterations it ran,
+# the change in the ranks after each of them and whether they converged
+Solution = namedtuple("Solution", ["ranks", "iterations", "residuals", "converged"])
+
+# Incremental updates push every page at once when more than one in this
+# many pages need pushing
+DENSE_PUSH = 8
+
 
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    corpus = crawl(sys.argv[1], cache=True)
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -22,31 +68,141 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, workers=None, cache=False):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
+    pages, edges = crawl_edges(directory, workers=workers, cache=cache)
+    corpus = {page: set() for page in pages}
+    for source, target in edges.tolist():
+        corpus[pages[source]].add(pages[target])
+    return corpus
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+def crawl_edges(directory, edges_path=None, workers=None, cache=False):
+    """
+    Parse a directory of HTML pages into a sorted list of page names and
+    an (E, 2) array of (source, target) page indices, one row per link
+    between two different pages of the corpus.
+
+    Pages are parsed by a pool of `workers` processes (one per CPU by
+    default). Each page's links are resolved against the page index and
+    appended to the edge list as soon as the page is parsed; with
+    `edges_path`, the edge list is written to that file as int32 pairs
+    and returned memory-mapped instead of being kept in memory.
+
+    With `cache`, the links found on each page are saved in the corpus
+    directory along with the page's modification time and size, and
+    later crawls only parse pages that were added or changed since.
+    """
+    pages = sorted(
+        filename for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+    index = {page: i for i, page in enumerate(pages)}
+    paths = [os.path.join(directory, page) for page in pages]
+
+    # Work out which pages need parsing, reusing cached links for the rest
+    cached = load_link_cache(directory) if cache else {}
+    signatures = {}
+    stale = []
+    for page, path in zip(pages, paths):
+        if cache:
+            stat = os.stat(path)
+            signatures[page] = (stat.st_mtime_ns, stat.st_size)
+            if page in cached and cached[page][0] == signatures[page]:
+                continue
+        stale.append(path)
+
+    edges = open(edges_path, "wb") if edges_path else bytearray()
+    write = edges.write if edges_path else edges.extend
+    executor = None
+    try:
+        if workers == 1 or len(stale) < PARALLEL_PAGES:
+            results = map(extract_links, stale)
+        else:
+            workers = workers or os.cpu_count()
+            executor = ProcessPoolExecutor(workers)
+            chunksize = max(1, len(stale) // (16 * workers))
+            results = executor.map(extract_links, stale, chunksize=chunksize)
+
+        for source, page in enumerate(pages):
+            if cache and page in cached and cached[page][0] == signatures[page]:
+                links = cached[page][1]
+            else:
+                links = next(results)
+                if cache:
+                    cached[page] = (signatures[page], links)
+            targets = [index[link] for link in links if link in index and index[link] != source]
+            if targets:
+                pairs = np.empty((len(targets), 2), dtype=np.int32)
+                pairs[:, 0] = source
+                pairs[:, 1] = sorted(targets)
+                write(pairs.tobytes())
+    finally:
+        if edges_path:
+            edges.close()
+        if executor is not None:
+            executor.shutdown()
+
+    if cache and (stale or len(cached) != len(pages)):
+        try:
+            save_link_cache(directory, {page: cached[page] for page in pages})
+        except OSError as e:
+            # The links are still usable, they just have to be parsed again next run
+            print(f"Could not save link cache: {e}", file=sys.stderr)
+
+    if not edges_path:
+        return pages, np.frombuffer(bytes(edges), dtype=np.int32).reshape(-1, 2)
+    if os.path.getsize(edges_path) == 0:
+        return pages, np.zeros((0, 2), dtype=np.int32)
+    return pages, np.memmap(edges_path, dtype=np.int32, mode="r").reshape(-1, 2)
+
+
+def load_link_cache(directory):
+    """
+    Return the cached links of each page in a corpus directory as a dict
+    mapping page names to ((mtime, size), links), or an empty dict.
+    """
+    try:
+        with open(os.path.join(directory, LINK_CACHE), "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+
+def save_link_cache(directory, cached):
+    path = os.path.join(directory, LINK_CACHE)
+
+    # Runs saving at once each write their own file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def extract_links(path):
+    """
+    Return the set of link targets in an HTML file, reading it a chunk at a
+    time. Anything from the last unfinished tag of a chunk onwards is carried
+    over so links split across chunks are still found.
+    """
+    links = set()
+    tail = b""
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            buffer = tail + chunk
+            links.update(LINK.findall(buffer))
+            cut = max(buffer.rfind(b"<"), len(buffer) - CHUNK_SIZE)
+            tail = buffer[cut:] if cut >= 0 else b""
+    return {link.decode("utf-8", "replace") for link in links}
 
 
 def transition_model(corpus, page, damping_factor):
@@ -58,57 +214,94 @@ def transition_model(corpus, page, damping_factor):
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
     """
+    distribution = transition(corpus, page, damping_factor).to_dict(corpus)
 
-    DAMPING_FACTOR = damping_factor
-    distribution = {}
-    linkCount = len(corpus[page])
-
-    if linkCount == 0:
-        # Divide probability evenly
-        value = round(1 / len(corpus), 3)
-        for page_ in corpus:
-            distribution[page_] = value
-        return distribution
-
-    # With probability 1 - damping_factor random surfer should choose one of all pages in corpus with equal probability
-    startingValue =  round((1 - DAMPING_FACTOR) / len(corpus), 3)
-    for page_ in corpus:
-        distribution[page_] = startingValue
-    
-    # Divide damping_factor amongst all other pages linked to page
-    value = round(damping_factor / linkCount, 3)
-    # print(value)
-    for page_ in corpus[page]:
-        distribution[page_] += value
-    
     assert round(sum(distribution.values())) == 1.0
 
     return distribution
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def transition(corpus, page, damping_factor):
+    """
+    Return the Transition out of `page`, the compact form of the
+    distribution transition_model returns.
+    """
+    links = tuple(corpus[page])
+    if not links:
+        # Divide probability evenly
+        return Transition(1 / len(corpus), 0.0, links)
+    return Transition((1 - damping_factor) / len(corpus), damping_factor / len(links), links)
+
+
+def sample_pagerank(corpus, damping_factor, n, surfers=SURFERS, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages
+    according to transition model, starting with a page at random.
+
+    The samples are taken by `surfers` independent random surfers moving
+    in lockstep, so each step of the simulation is a handful of NumPy
+    operations over every surfer at once.
+    """
     if n < 0: raise RuntimeError
 
-    pageRanks = { page: 0.0 for page in corpus }
-
-    currentSample = random.choice(list(corpus.keys()))
-    pageRanks[currentSample] += 1
-    
-    for _ in range(n - 1):
-        # get the probabilities for the next sample
-        distribution = transition_model(corpus, currentSample, damping_factor)
-        nextPage = random.choices(list(distribution.keys()), list(float(value) for value in distribution.values()), k=1)[0]
-        pageRanks[nextPage] += 1
-        currentSample = nextPage
-
-    for page in pageRanks: # Normalise values
-        pageRanks[page] = pageRanks[page] /  n
-    
+    links = LinkMatrix.from_corpus(corpus)
+    counts = random_surfers(links, damping_factor, n, surfers, np.random.default_rng(seed))
+    pageRanks = links.to_dict(counts / n)
+
     assert round(sum(pageRanks.values())) == 1.0
 
     return pageRanks
 
-def iterate_pagerank(corpus, damping_factor):
+
+def random_surfers(links, damping_factor, n, surfers, rng):
+    """
+    Return how many of `n` samples landed on each page of a LinkMatrix.
+
+    Every surfer starts on a random page and first takes enough unrecorded
+    steps for the bias from that start to fall below 1 / n, after which
+    each step of each surfer is one sample.
+    """
+    indptr, indices = links.out_links()
+    outdegree = links.outdegree
+    surfers = max(1, min(surfers, n))
+
+    burnIn = 0
+    if 0 < damping_factor < 1 and n > 1:
+        burnIn = math.ceil(math.log(n) / -math.log(damping_factor))
+
+    def step(current):
+        # Follow a random link with probability damping_factor when there is
+        # one, otherwise jump to a random page in the corpus
+        nextPages = rng.integers(0, links.size, len(current))
+        follow = (rng.random(len(current)) < damping_factor) & (outdegree[current] > 0)
+        choice = (rng.random(np.count_nonzero(follow)) * outdegree[current[follow]]).astype(np.int64)
+        nextPages[follow] = indices[indptr[current[follow]] + choice]
+        return nextPages
+
+    current = rng.integers(0, links.size, surfers)
+    for _ in range(burnIn):
+        current = step(current)
+
+    counts = np.zeros(links.size, dtype=np.int64)
+    visits = np.empty(max(BATCH, surfers), dtype=np.int64)
+    filled = 0
+    remaining = n
+    while remaining > 0:
+        taken = min(surfers, remaining)
+        if filled + taken > len(visits):
+            counts += np.bincount(visits[:filled], minlength=links.size)
+            filled = 0
+        visits[filled:filled + taken] = current[:taken]
+        filled += taken
+        remaining -= taken
+        if remaining > 0:
+            current = step(current)
+    counts += np.bincount(visits[:filled], minlength=links.size)
+    return counts
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001, norm="max",
+                     max_iterations=None, method="jacobi", extrapolation=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -116,41 +309,517 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    See power_iteration for the meaning of the optional arguments.
     """
-    DAMPING_FACTOR = damping_factor
-    pageCount = len(corpus)
-    pageRanks = { page: 1 / pageCount for page in corpus }
-    previousRanks = copy.deepcopy(pageRanks)
-
-    # is only false when the difference between elements in pageRanks and previousRanks are all within 0.001
-    significantDifference = True
-
-    while significantDifference:
-        for page in corpus:
-            # Calculate summation 
-            summation = 0
-            for page_ in corpus:
-                # find number of links on page
-                linkCount = len(corpus[page_])
-
-                if linkCount == 0: # if a page has no links at all
-                    summation += previousRanks[page_] / pageCount
-                elif page in corpus[page_]: # Check if page_ links to page if so we include it
-                    summation += previousRanks[page_] / linkCount
-            
-            pageRanks[page] = (1 - DAMPING_FACTOR) / pageCount + DAMPING_FACTOR * summation
-
-        significantDifference = False
-        for page in corpus:
-            if abs(previousRanks[page] - pageRanks[page]) > 0.001:
-                significantDifference = True
-                break
-        
-        previousRanks = copy.deepcopy(pageRanks)
+    pageRanks = solve_pagerank(
+        corpus, damping_factor, tolerance, norm, max_iterations, method, extrapolation
+    ).ranks
 
     assert round(sum(pageRanks.values())) == 1.0
 
     return pageRanks
 
+
+def solve_pagerank(corpus, damping_factor, tolerance=0.001, norm="max",
+                   max_iterations=None, method="jacobi", extrapolation=None):
+    """
+    Iterate PageRank like iterate_pagerank, but return a Solution recording
+    how many iterations it took and the residual after each of them.
+    """
+    links = LinkMatrix.from_corpus(corpus)
+    residuals = []
+    ranks = power_iteration(links, damping_factor, tolerance, norm, max_iterations,
+                            method, extrapolation, residuals)
+    converged = bool(residuals) and residuals[-1] <= tolerance
+    return Solution(links.to_dict(ranks), len(residuals), residuals, converged)
+
+
+def power_iteration(links, damping_factor, tolerance=0.001, norm="max",
+                    max_iterations=None, method="jacobi", extrapolation=None,
+                    residuals=None):
+    """
+    Return the PageRank vector for a LinkMatrix, repeatedly applying the
+    PageRank formula to every page until the ranks change by no more
+    than `tolerance` between iterations, or `max_iterations` have run.
+
+    `norm` is how the change is measured: "max" for the largest change
+    to any one page, or "l1" for the sum of the changes. `method` is
+    "jacobi" to update every page from the previous iteration's ranks,
+    or "gauss-seidel" to update blocks of pages in turn, each using
+    the ranks just computed for the blocks before it. `extrapolation`
+    may be "aitken" or "quadratic" to jump towards the limit of the last
+    few iterations whenever they settle into shrinking at a steady rate;
+    quadratic extrapolation is the more reliable of the two. The change
+    after each iteration is appended to the `residuals` list, if given.
+    """
+    if norm not in NORMS:
+        raise ValueError(f"unknown norm {norm!r}")
+    if method not in SWEEPS:
+        raise ValueError(f"unknown method {method!r}")
+    if extrapolation is not None and extrapolation not in EXTRAPOLATIONS:
+        raise ValueError(f"unknown extrapolation {extrapolation!r}")
+    measure = NORMS[norm]
+    sweep = SWEEPS[method]
+
+    pageCount = links.size
+    ranks = np.full(pageCount, 1 / pageCount)
+    history = deque(maxlen=4)
+    changes = deque(maxlen=3)
+    iteration = 0
+
+    while max_iterations is None or iteration < max_iterations:
+        newRanks = sweep(links, damping_factor, ranks)
+        iteration += 1
+        residual = float(measure(newRanks - ranks))
+        if residuals is not None:
+            residuals.append(residual)
+        ranks = newRanks
+        if residual <= tolerance:
+            break
+
+        if extrapolation is not None:
+            history.append(ranks)
+            changes.append(residual)
+            if len(history) == history.maxlen and steady(changes):
+                ranks = EXTRAPOLATIONS[extrapolation](history)
+                history.clear()
+
+    return ranks / ranks.sum()
+
+
+def steady(changes):
+    """
+    Return whether the last three changes between iterations shrank by
+    nearly the same factor, meaning one eigenvector of the link matrix
+    dominates the remaining error and extrapolation can remove it.
+    """
+    if len(changes) < 3 or not changes[0] or not changes[1]:
+        return False
+    latest = changes[2] / changes[1]
+    return abs(latest - changes[1] / changes[0]) <= EXTRAPOLATION_STEADINESS * latest
+
+
+def jacobi_sweep(links, damping_factor, ranks):
+    """
+    Apply the PageRank formula to every page at once.
+    """
+    return (1 - damping_factor) / links.size + damping_factor * links.multiply(ranks)
+
+
+def gauss_seidel_sweep(links, damping_factor, ranks):
+    """
+    Apply the PageRank formula to blocks of pages in turn, so pages in
+    later blocks already see the new ranks of pages in earlier ones.
+    """
+    pageCount = links.size
+    newRanks = ranks.copy()
+    bounds = np.linspace(0, pageCount, min(GAUSS_SEIDEL_BLOCKS, pageCount) + 1).astype(np.int64)
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        newRanks[first:last] = (
+            (1 - damping_factor) / pageCount
+            + damping_factor * links.multiply_rows(newRanks, first, last)
+        )
+
+    # Unlike a Jacobi sweep, this does not keep the ranks summing to one,
+    # and left alone the total would only settle as fast as power iteration
+    return newRanks / newRanks.sum()
+
+
+def aitken_extrapolation(history):
+    """
+    Estimate the limit of each page's rank from its last three iterates
+    with Aitken's delta-squared process. Pages whose rank is not closing
+    in on a limit geometrically, where the estimate would be meaningless,
+    keep their latest iterate.
+    """
+    x0, x1, x2 = history[-3], history[-2], history[-1]
+    previousStep = x1 - x0
+    step = x2 - x1
+    ratio = np.divide(step, previousStep, out=np.zeros_like(step), where=previousStep != 0)
+    geometric = (ratio > 0) & (ratio < 1)
+    ranks = x2.copy()
+    ranks[geometric] += step[geometric] * ratio[geometric] / (1 - ratio[geometric])
+    return ranks / ranks.sum()
+
+
+def quadratic_extrapolation(history):
+    """
+    Estimate the limit of the last four iterates by assuming the ranks
+    are dominated by the first three eigenvectors of the link matrix,
+    as in Kamvar et al.'s quadratic extrapolation.
+    """
+    x0, x1, x2, x3 = history
+    y = np.column_stack((x1 - x0, x2 - x0))
+    gamma1, gamma2 = np.linalg.lstsq(y, -(x3 - x0), rcond=None)[0]
+    gamma3 = 1
+    ranks = (gamma1 + gamma2 + gamma3) * x1 + (gamma2 + gamma3) * x2 + gamma3 * x3
+    if not np.all(np.isfinite(ranks)) or ranks.sum() <= 0:
+        return x3
+    ranks = np.maximum(ranks, 0)
+    return ranks / ranks.sum()
+
+
+def iterate_pagerank_mapped(directory, damping_factor, workspace, **options):
+    """
+    Return PageRank values like iterate_pagerank for the corpus in
+    `directory`, without ever holding its links in memory.
+
+    The corpus is crawled into an edge list in `workspace`, which is then
+    sorted into a MappedLinkMatrix alongside it and iterated over with
+    power_iteration, to which any other keyword arguments are passed.
+    """
+    os.makedirs(workspace, exist_ok=True)
+    pages, edges = crawl_edges(directory, os.path.join(workspace, "edges.bin"))
+    links = MappedLinkMatrix.build(edges, len(pages), workspace)
+    ranks = power_iteration(links, damping_factor, **options)
+    return dict(zip(pages, ranks.tolist()))
+
+
+def personalized_pagerank(corpus, damping_factor, teleports, tolerance=1e-6,
+                          max_iterations=None):
+    """
+    Return PageRank values personalized to each entry of `teleports`, a
+    list of sets of seed pages or of dictionaries weighting pages, where
+    random surfers who get bored jump to a page chosen by those weights
+    (equally among the seeds of a set) rather than to any page at all.
+
+    Return a list with a dictionary of ranks for each entry of `teleports`,
+    computed together by personalized_iteration.
+    """
+    links = LinkMatrix.from_corpus(corpus)
+    index = {page: i for i, page in enumerate(links.pages)}
+    teleport = np.zeros((links.size, len(teleports)))
+    for column, seeds in enumerate(teleports):
+        weights = seeds if isinstance(seeds, dict) else dict.fromkeys(seeds, 1)
+        for page, weight in weights.items():
+            if page not in index:
+                raise ValueError(f"{page} is not a page in the corpus")
+            teleport[index[page], column] = weight
+
+    totals = teleport.sum(axis=0)
+    if np.any(totals <= 0):
+        raise ValueError("every teleport needs a page with positive weight")
+    ranks = personalized_iteration(links, damping_factor, teleport / totals,
+                                   tolerance, max_iterations)
+    return [links.to_dict(column) for column in ranks.T]
+
+
+def personalized_iteration(links, damping_factor, teleport, tolerance=1e-6,
+                           max_iterations=None):
+    """
+    Return an (N, K) matrix whose columns are the PageRank vectors for a
+    LinkMatrix of N pages and each column of `teleport`, an (N, K) matrix
+    of teleportation probabilities.
+
+    Every iteration multiplies the link matrix by all the columns still
+    changing by more than `tolerance` (in the L1 norm) at once, so the
+    edges are read once per iteration rather than once per column.
+    Pages without links spread their rank over the whole corpus, as in
+    power_iteration.
+    """
+    ranks = np.array(teleport, dtype=float)
+    columns = np.arange(ranks.shape[1])
+    jumps = (1 - damping_factor) * ranks
+    block = ranks.copy()
+    iteration = 0
+
+    while len(columns) and (max_iterations is None or iteration < max_iterations):
+        newBlock = links.multiply(block)
+        newBlock *= damping_factor
+        newBlock += jumps
+        iteration += 1
+
+        # Each column's change, computed in the old block to save memory
+        block -= newBlock
+        np.abs(block, out=block)
+        changing = block.sum(axis=0) > tolerance
+        block = newBlock
+
+        # Set converged columns aside so later iterations skip them
+        if not changing.all():
+            ranks[:, columns[~changing]] = block[:, ~changing]
+            columns = columns[changing]
+            block = block[:, changing]
+            jumps = jumps[:, changing]
+
+    ranks[:, columns] = block
+    return ranks
+
+
+def update_pagerank(corpus, damping_factor, previous, tolerance=1e-6):
+    """
+    Return PageRank values for a corpus that has changed since `previous`,
+    a dictionary of ranks computed for an earlier version of it.
+
+    Rather than iterating from a uniform distribution, the previous ranks
+    are kept and only corrected where the change actually matters, which
+    after a small edit means around the pages that were added or edited.
+    Pages new to the corpus start from the teleportation probability.
+    """
+    links = LinkMatrix.from_corpus(corpus)
+    start = warm_start(links, damping_factor, previous)
+    ranks, _ = push_pagerank(links, damping_factor, start, tolerance, rescale=True)
+    ranks /= ranks.sum()
+    return links.to_dict(ranks)
+
+
+def warm_start(links, damping_factor, previous):
+    """
+    Return `previous`, a dictionary of ranks for an earlier version of a
+    corpus, as a vector for a LinkMatrix of the current one. Pages new to
+    the corpus start from the teleportation probability, and the vector
+    is normalized to sum to 1 again.
+    """
+    start = np.array([
+        previous.get(page, (1 - damping_factor) / links.size)
+        for page in links.pages
+    ])
+    return start / start.sum()
+
+
+def push_pagerank(links, damping_factor, ranks, tolerance, rescale=False):
+    """
+    Refine an approximate PageRank vector for a LinkMatrix by pushing
+    residuals, returning the refined vector and the number of pushes.
+
+    The residual of each page is how far its rank is from satisfying the
+    PageRank formula given everyone else's rank. One vectorized pass finds
+    every residual; after that, each round every page whose residual
+    exceeds tolerance / pages absorbs it into its rank and passes the
+    damped share of it on to the pages it links to. Only pages reached
+    by those shares are checked again, so work stays around the changes
+    until they have spread over a large part of the corpus. Once they
+    have, every page is pushed at once until the residuals are small
+    enough that the ranks are within `tolerance` of the solution in sum.
+
+    Adding or removing pages changes the teleportation probability, and
+    so every page's residual, by the same amount. Any probability gives
+    ranks in the same proportions, so with `rescale` the one that leaves
+    the typical page with no residual is used instead, and is adjusted
+    again whenever every page is pushed at once; the result must then be
+    normalized to sum to 1.
+    """
+    pageCount = links.size
+    ranks = ranks.astype(float)
+    residual = damping_factor * links.multiply(ranks) - ranks
+    residual += -np.median(residual) if rescale else (1 - damping_factor) / pageCount
+    threshold = tolerance / pageCount
+    indptr, indices = links.out_links()
+    outdegree = links.outdegree
+
+    # Residual owed to every page at once by pushes from pages without links,
+    # applied only once it grows large enough to matter
+    uniform = 0.0
+    pushes = 0
+
+    # Scratch space for finding the distinct pages a round pushed to
+    latest = np.empty(pageCount, dtype=np.int64)
+
+    active = np.flatnonzero(np.abs(residual) > threshold)
+    while len(active):
+        if len(active) * DENSE_PUSH > pageCount:
+            # Most pages need pushing anyway, so push every page at once
+            # with a single multiplication instead of following links
+            residual += uniform
+            uniform = 0.0
+            ranks += residual
+            residual = damping_factor * links.multiply(residual)
+            if rescale:
+                # Pushing only shrinks the total residual by the damping
+                # factor each time, so shift it to zero instead
+                residual -= residual.mean()
+            pushes += pageCount
+            magnitudes = np.abs(residual)
+            if magnitudes.sum() <= (1 - damping_factor) * tolerance:
+                break
+            active = np.flatnonzero(magnitudes > threshold)
+            continue
+
+        amounts = residual[active]
+        ranks[active] += amounts
+        residual[active] = 0
+        pushes += len(active)
+
+        dangling = outdegree[active] == 0
+        uniform += damping_factor * amounts[dangling].sum() / pageCount
+
+        # Spread each linked page's residual over the targets of its links
+        linked = active[~dangling]
+        counts = outdegree[linked]
+        positions = np.repeat(indptr[linked] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        targets = indices[positions]
+        np.add.at(residual, targets, np.repeat(damping_factor * amounts[~dangling] / counts, counts))
+
+        # Every page pushed to, once: the one place in `targets` it was last
+        # written to in `latest`, which unlike np.unique needs no sorting
+        order = np.arange(len(targets))
+        latest[targets] = order
+        candidates = targets[latest[targets] == order]
+        if abs(uniform) > threshold / 2:
+            residual += uniform
+            uniform = 0.0
+            candidates = np.arange(pageCount)
+        active = candidates[np.abs(residual[candidates]) > threshold]
+
+    return ranks, pushes
+
+
+# Ways of applying the PageRank formula in one iteration, by name
+SWEEPS = {
+    "jacobi": jacobi_sweep,
+    "gauss-seidel": gauss_seidel_sweep,
+}
+
+# Ways of accelerating power iteration, by name
+EXTRAPOLATIONS = {
+    "aitken": aitken_extrapolation,
+    "quadratic": quadratic_extrapolation,
+}
+
+
+class LinkMatrix():
+    """
+    Column-stochastic link matrix of a corpus, stored as NumPy arrays of
+    (source, target) page indices sorted by target.
+
+    Page i links to each of its outgoing links with probability
+    1 / outdegree[i]; pages with no links at all are treated as linking
+    to every page in the corpus, including themselves.
+    """
+
+    def __init__(self, pages, sources, targets):
+        self.pages = pages
+        self.size = len(pages)
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.lexsort((sources, targets))
+        self.sources = sources[order]
+        self.targets = targets[order]
+
+        # Targets of the links in order of source, for out_links, kept as
+        # given when the links come sorted by source as from_corpus gives them
+        self.outgoing = targets if np.all(sources[1:] >= sources[:-1]) else None
+        self.outdegree = np.bincount(self.sources, minlength=self.size)
+        self.weights = 1 / self.outdegree[self.sources]
+        self.dangling = np.flatnonzero(self.outdegree == 0)
+
+        # Start of each run of edges sharing a target, for np.add.reduceat
+        if len(self.targets):
+            self.starts = np.flatnonzero(np.r_[True, self.targets[1:] != self.targets[:-1]])
+        else:
+            self.starts = np.zeros(0, dtype=np.int64)
+        self.rows = self.targets[self.starts]
+
+        # SciPy copy of the matrix for multiplying many vectors at once
+        self.matrix = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources = [index[page] for page in pages for _ in corpus[page]]
+        targets = [index[link] for page in pages for link in corpus[page]]
+        return cls(pages, np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64))
+
+    def multiply(self, ranks):
+        """
+        Return the link matrix times `ranks`, a vector with one entry per
+        page or a matrix with one row per page, spreading the mass of
+        pages without links evenly over the whole corpus.
+        """
+        if ranks.ndim == 1:
+            result = np.zeros_like(ranks)
+            if len(self.starts):
+                result[self.rows] = np.add.reduceat(ranks[self.sources] * self.weights, self.starts)
+        else:
+            # Gathering every column at once would need a temporary the size
+            # of the edge list times the number of columns, so use SciPy's
+            # sparse product, which walks the edges once without one
+            result = self.sparse() @ ranks
+        result += ranks[self.dangling].sum(axis=0) / self.size
+        return result
+
+    def sparse(self):
+        """
+        Return the link matrix as a SciPy CSR matrix, leaving out the
+        columns of pages without links, building it on first use.
+        """
+        if self.matrix is None:
+            self.matrix = sparse.csr_matrix(
+                (self.weights, (self.targets, self.sources)), shape=(self.size, self.size)
+            )
+        return self.matrix
+
+    def multiply_rows(self, ranks, first, last):
+        """
+        Return rows first..last - 1 of the link matrix times `ranks`,
+        the new ranks of those pages before damping and teleportation.
+        """
+        result = np.zeros(last - first)
+        low, high = np.searchsorted(self.rows, [first, last])
+        if high > low:
+            end = self.starts[high] if high < len(self.starts) else len(self.sources)
+            edges = slice(self.starts[low], end)
+            result[self.rows[low:high] - first] = np.add.reduceat(
+                ranks[self.sources[edges]] * self.weights[edges],
+                self.starts[low:high] - self.starts[low]
+            )
+        result += ranks[self.dangling].sum() / self.size
+        return result
+
+    def out_links(self):
+        """
+        Return (indptr, indices) arrays listing the targets of page i's
+        links as indices[indptr[i]:indptr[i + 1]].
+        """
+        if self.outgoing is None:
+            self.outgoing = self.targets[np.argsort(self.sources)]
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(self.outdegree, out=indptr[1:])
+        return indptr, self.outgoing
+
+    def to_dict(self, ranks):
+        return {page: float(rank) for page, rank in zip(self.pages, ranks)}
+
+
+class Transition():
+    """
+    Probability distribution over which page a random surfer visits
+    next, stored without listing every page: each page in the corpus
+    has probability `teleport`, and each page in `links` has `follow`
+    on top of that.
+    """
+
+    __slots__ = ("teleport", "follow", "links")
+
+    def __init__(self, teleport, follow, links):
+        self.teleport = teleport
+        self.follow = follow
+        self.links = links
+
+    def probability(self, page):
+        return self.teleport + self.follow * self.links.count(page)
+
+    def to_dict(self, pages):
+        distribution = dict.fromkeys(pages, self.teleport)
+        for page in self.links:
+            distribution[page] += self.follow
+        return distribution
+
+    def sample(self, pages, rng):
+        """
+        Return a page drawn from the distribution using `rng`, a
+        random.Random, choosing from `pages`, every page in the corpus,
+        when teleporting.
+        """
+        # teleport * len(pages) can round to just under 1 for pages
+        # without links, so check for them rather than trust the product
+        if not self.links or rng.random() < self.teleport * len(pages):
+            return rng.choice(pages)
+        return rng.choice(self.links)
+
+
 if __name__ == "__main__":
     main()